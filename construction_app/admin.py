@@ -1,9 +1,20 @@
+from datetime import timedelta
+
 from django.contrib import admin
+from django.contrib.postgres.aggregates import StringAgg
+from django.db import connections
+from django.db.models import CharField, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Cast, Concat
+from django.template.defaultfilters import linebreaksbr
 # from django.core.exceptions import ValidationError
 
-from .models import Project, Material, DailyLog, MaterialUsage
+from .models import (
+    Project, Material, DailyLog, MaterialUsage, ProjectArchive, RecomputeJob, StockMovement, StockSnapshot,
+)
+from .pagination import EstimatedCountPaginator
 
-from django.utils.html import format_html
+from django.utils.html import format_html_join
+from django.utils.safestring import mark_safe
 
 
 @admin.register(Project)
@@ -11,11 +22,26 @@ class ProjectAdmin(admin.ModelAdmin):
     list_display = ("name", "location", "start_date", "end_date", "status", "total_cost")
     prepopulated_fields = {"slug": ("name",)}
     list_filter = ("status",)
+    search_fields = ("^name",)
+    ordering = ("name",)
+    actions = ["schedule_recompute"]
+
+    @admin.action(description="Přepočítat náklady a denní souhrny (na pozadí)")
+    def schedule_recompute(self, request, queryset):
+        project_ids = list(queryset.values_list("pk", flat=True))
+        RecomputeJob.schedule("project_cost", project_ids, delay=timedelta(0))
+        RecomputeJob.schedule("daily_summaries", project_ids, delay=timedelta(0))
+        self.message_user(request, f"Naplánován přepočet projektů: {len(project_ids)}")
     
     
 @admin.register(Material)
 class MaterialAdmin(admin.ModelAdmin):
     list_display = ("name", "join_quantity_unit", "price", "price_per_unit")
+    # hledání podle začátku názvu přes index UPPER(name) - i pro našeptávač v řádcích materiálu
+    search_fields = ("^name",)
+    ordering = ("name",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def join_quantity_unit(self, obj):
         return f"{obj.quantity} {obj.unit}"
@@ -26,21 +52,121 @@ class MaterialUsageInline(admin.TabularInline):
     model = MaterialUsage
     extra = 1
     fields = ("material", "used_quantity")
+    # našeptávač místo <select> se všemi materiály v každém řádku
+    autocomplete_fields = ("material",)
+
+    def get_queryset(self, request):
+        # __str__ řádku (zobrazený v tabulce) čte záznam i materiál
+        return super().get_queryset(request).select_related("daily_log", "material")
+
+
+def used_materials_subquery():
+    """
+    Použité materiály záznamu jako jeden text ("název - množství ks" po řádcích) - korelovaný
+    poddotaz se STRING_AGG, počítá se jen pro řádky zobrazené stránky.
+    """
+    return Subquery(
+        MaterialUsage.objects
+        .filter(daily_log=OuterRef("pk"))
+        .values("daily_log")
+        .annotate(text=StringAgg(
+            Concat("material__name", Value(" - "), Cast("used_quantity", CharField()), Value(" ks")),
+            delimiter="\n",
+            ordering="pk",
+        ))
+        .values("text"),
+        output_field=CharField(),
+    )
 
 
 @admin.register(DailyLog)
 class DailyLogAdmin(admin.ModelAdmin):
     list_display = ("date", "project", "description", "get_used_materials", "work_time", "temperature")
-    list_filter = ("project__name",)
+    # filtr podle project_id bez joinu na projekt
+    list_filter = ("project",)
+    list_select_related = ("project",)
+    autocomplete_fields = ("project",)
     inlines = [MaterialUsageInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if connections[queryset.db].vendor == "postgresql":
+            return queryset.annotate(used_materials=used_materials_subquery())
+        # STRING_AGG je jen v PostgreSQL - jinde materiály všech řádků stránky jedním dotazem navíc
+        return queryset.prefetch_related(
+            Prefetch("daily_usages", queryset=MaterialUsage.objects.select_related("material"))
+        )
 
     def get_used_materials(self, obj):
-        materials = MaterialUsage.objects.filter(daily_log=obj)
-        return format_html("<br>".join(f"{material.material.name} - {material.used_quantity} ks" for material in materials))
+        if hasattr(obj, "used_materials"):
+            return linebreaksbr(obj.used_materials or "")
+        return format_html_join(
+            mark_safe("<br>"),
+            "{} - {} ks",
+            ((usage.material.name, usage.used_quantity) for usage in obj.daily_usages.all()),
+        )
     get_used_materials.short_description = "Použité materiály"
 
 
 @admin.register(MaterialUsage)
 class MaterialUsageAdmin(admin.ModelAdmin):
     list_display = ("daily_log", "material", "used_quantity")
-    list_filter = ("daily_log__project__name",)
+    list_select_related = ("daily_log__project", "material")
+    list_filter = ("daily_log__project",)
+    autocomplete_fields = ("material",)
+    raw_id_fields = ("daily_log",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "material", "kind", "quantity")
+    list_select_related = ("material",)
+    list_filter = ("kind",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    # pohyby vznikají jen spolu se změnou zásoby materiálu, ručně přidaný by s ní nesouhlasil;
+    # evidence se pouze doplňuje
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("taken_at", "material", "quantity")
+    list_select_related = ("material",)
+    autocomplete_fields = ("material",)
+
+
+@admin.register(RecomputeJob)
+class RecomputeJobAdmin(admin.ModelAdmin):
+    list_display = ("kind", "project", "run_after", "started_at", "attempts", "last_error")
+    list_select_related = ("project",)
+    list_filter = ("kind",)
+    autocomplete_fields = ("project",)
+
+
+@admin.register(ProjectArchive)
+class ProjectArchiveAdmin(admin.ModelAdmin):
+    list_display = ("project", "archived_at", "log_count", "first_date", "last_date", "work_time", "material_cost")
+    list_select_related = ("project",)
+
+    # archiv vzniká a zaniká jen příkazem archive_projects a obnovou projektu
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,179 @@
+from decimal import Decimal
+from itertools import groupby
+
+from django.db import connections, models
+from django.db.models import F, Func, Sum, Window
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils.duration import duration_string
+
+from .models import ArchivedMaterialUsage, MaterialUsage, ProjectDailySummary
+
+PERIODS = {
+    "week": TruncWeek,
+    "month": TruncMonth,
+}
+
+
+class RunningSum(Func):
+    """
+    SUM(...) použitelné jako okenní funkce nad agregací skupiny, tj. SUM(SUM(x)) OVER (...).
+    Vestavěný Sum agregaci uvnitř nepovolí.
+    """
+    function = "SUM"
+    window_compatible = True
+
+
+def money(value):
+    return str(Decimal(value or 0).quantize(Decimal("0.01")))
+
+
+def running_total(aggregate, partition_by, output_field=None):
+    return Window(
+        RunningSum(aggregate, output_field=output_field),
+        partition_by=F(partition_by),
+        order_by=F("period").asc(),
+    )
+
+
+def project_series_queryset(period, projects=None, date_from=None, date_to=None):
+    """
+    Náklady na materiál a odpracovaný čas projektů po týdnech nebo měsících včetně průběžných
+    součtů - jeden seskupený dotaz nad denními souhrny pro libovolný počet projektů.
+    """
+    summaries = ProjectDailySummary.objects.all()
+    if projects:
+        summaries = summaries.filter(project__in=projects)
+    if date_from:
+        summaries = summaries.filter(date__gte=date_from)
+    if date_to:
+        summaries = summaries.filter(date__lte=date_to)
+    return (
+        summaries
+        .annotate(period=PERIODS[period]("date"))
+        .values("project", "project__name", "period")
+        # aliasy se liší od názvů polí, jinak by je okenní součty považovaly za agregace
+        .annotate(
+            logs=Sum("log_count"),
+            cost=Sum("material_cost"),
+            work=Sum("work_time"),
+        )
+        .annotate(
+            cumulative_cost=running_total(Sum("material_cost"), "project"),
+            cumulative_work_time=running_total(Sum("work_time"), "project", models.DurationField()),
+        )
+        .order_by("project", "period")
+    )
+
+
+def usage_rows(usage_model, period, projects=None, materials=None, date_from=None, date_to=None):
+    """
+    Neseskupené řádky materiálu (aktivní, nebo archivované podle usage_model) s obdobím a náklady
+    řádku - jedna větev UNION ALL v material_series_rows.
+    """
+    usages = usage_model.objects.all()
+    if projects:
+        usages = usages.filter(daily_log__project__in=projects)
+    if materials:
+        usages = usages.filter(material__in=materials)
+    if date_from:
+        usages = usages.filter(daily_log__date__gte=date_from)
+    if date_to:
+        usages = usages.filter(daily_log__date__lte=date_to)
+    # pořadí sloupců v SQL: pole, pak anotace v pořadí jejich přidání - v obou větvích stejné
+    return (
+        usages
+        .annotate(period=PERIODS[period]("daily_log__date"))
+        .annotate(line_cost=F("used_quantity") * F("material__price_per_unit"))
+        .values_list("material", "material__name", "material__unit", "used_quantity", "period", "line_cost")
+        .order_by()
+    )
+
+
+def material_series_rows(period, **filters):
+    """
+    Spotřeba a náklady jednotlivých materiálů po týdnech nebo měsících včetně průběžných součtů
+    - jeden dotaz: seskupení a okenní součty nad UNION ALL aktivních a archivovaných řádků.
+    ORM neumí seskupovat nad sjednocením, vnější dotaz je proto SQL kolem větví sestavených v ORM.
+    """
+    branches = [usage_rows(model, period, **filters) for model in (MaterialUsage, ArchivedMaterialUsage)]
+    connection = connections[branches[0].db]
+    compiled = [branch.query.get_compiler(using=branch.db).as_sql() for branch in branches]
+    source = " UNION ALL ".join(sql for sql, _ in compiled)
+    params = [param for _, branch_params in compiled for param in branch_params]
+    with connection.cursor() as cursor:
+        # sloupce sjednocení se jmenují podle první větve (material_id, name, unit, used_quantity, period, line_cost)
+        cursor.execute(
+            f"""
+            SELECT material_id, name, unit, period, COUNT(*), SUM(used_quantity), SUM(line_cost),
+                SUM(SUM(used_quantity)) OVER (PARTITION BY material_id ORDER BY period),
+                SUM(SUM(line_cost)) OVER (PARTITION BY material_id ORDER BY period)
+            FROM ({source}) usage
+            GROUP BY material_id, name, unit, period
+            ORDER BY material_id, period
+            """,
+            params,
+        )
+        rows = cursor.fetchall()
+    # SQLite vrací období jako text
+    to_date = models.DateField().to_python
+    return [
+        {
+            "material": material, "material__name": name, "material__unit": unit, "period": to_date(period),
+            "usage_count": usage_count, "quantity": quantity, "cost": cost,
+            "cumulative_quantity": cumulative_quantity, "cumulative_cost": cumulative_cost,
+        }
+        for material, name, unit, period, usage_count, quantity, cost, cumulative_quantity, cumulative_cost in rows
+    ]
+
+
+def project_series(period, **filters):
+    """
+    Řady projektů ve tvaru pro API: [{"project", "name", "series": [...]}]
+    """
+    rows = project_series_queryset(period, **filters)
+    return [
+        {
+            "project": project,
+            "name": name,
+            "series": [
+                {
+                    "period": row["period"],
+                    "log_count": row["logs"],
+                    "material_cost": money(row["cost"]),
+                    "work_time": duration_string(row["work"]),
+                    "cumulative_cost": money(row["cumulative_cost"]),
+                    "cumulative_work_time": duration_string(row["cumulative_work_time"]),
+                }
+                for row in group
+            ],
+        }
+        for (project, name), group in groupby(rows, key=lambda row: (row["project"], row["project__name"]))
+    ]
+
+
+def material_series(period, **filters):
+    """
+    Řady materiálů ve tvaru pro API: [{"material", "name", "unit", "series": [...]}]
+    """
+    rows = material_series_rows(period, **filters)
+    return [
+        {
+            "material": material,
+            "name": name,
+            "unit": unit,
+            "series": [
+                {
+                    "period": row["period"],
+                    "usage_count": row["usage_count"],
+                    "quantity": row["quantity"],
+                    "cost": money(row["cost"]),
+                    "cumulative_quantity": row["cumulative_quantity"],
+                    "cumulative_cost": money(row["cumulative_cost"]),
+                }
+                for row in group
+            ],
+        }
+        for (material, name, unit), group in groupby(
+            rows, key=lambda row: (row["material"], row["material__name"], row["material__unit"])
+        )
+    ]
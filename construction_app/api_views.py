@@ -1,17 +1,71 @@
+from collections import Counter
+from copy import copy
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import ProtectedError
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
-from .models import Project, Material
-from .serializers import ProjectSerializer, MaterialSerializer
+from .analytics import material_series, project_series
+from .caching import cached_api_get, get_stats
+from .ingest import ingest_ndjson
+from .pagination import InvalidCursor, get_next_link, get_page_size, paginate_keyset, paginate_keyset_values
+from .forms import AnalyticsFilterForm, DailyLogFilterForm
+from .models import Project, Material, ArchivedDailyLog, DailyLog, RecomputeJob, MATERIAL_IN_ARCHIVE_ERROR
+from .serializers import (
+    ProjectSerializer, MaterialSerializer, DailyLogSerializer, DailyLogDetailSerializer, DailyLogCreateSerializer,
+    fast_list_data, fast_list_fields,
+)
+
+
+def keyset_page(request, queryset, ordering=("pk",)):
+    """
+    Stránka výsledků podle kurzoru z ?cursor=...&page_size=...
+    """
+    return paginate_keyset(
+        queryset,
+        ordering,
+        request.query_params.get("cursor"),
+        get_page_size(request.query_params.get("page_size")),
+    )
+
+
+def keyset_values_page(request, queryset, serializer_class, ordering=("pk",)):
+    """
+    Stránka seznamu jen pro čtení: řádky přes values_list() jen s poli serializeru, převedené
+    na stejná data jako serializer_class(many=True).data.
+    """
+    _, lookups, _ = fast_list_fields(serializer_class)
+    rows, next_cursor = paginate_keyset_values(
+        queryset,
+        ordering,
+        lookups,
+        request.query_params.get("cursor"),
+        get_page_size(request.query_params.get("page_size")),
+    )
+    return fast_list_data(serializer_class, rows), next_cursor
+
+
+def daily_log_querysets(filter_form):
+    """
+    Filtrované aktivní a archivované denní záznamy pro společné stránkování.
+    """
+    return [filter_form.filter(DailyLog.objects.all()), filter_form.filter(ArchivedDailyLog.objects.all())]
 
 
 class ProjectListApiView(APIView):
+    @cached_api_get("project")
     def get(self, request):
-        projects = Project.objects.all()
-        serializer = ProjectSerializer(projects, many=True)
-        return Response(serializer.data)
+        try:
+            results, next_cursor = keyset_values_page(request, Project.objects.all(), ProjectSerializer)
+        except InvalidCursor as error:
+            return Response({"detail": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"next": get_next_link(request, next_cursor), "results": results})
 
     def post(self, request):
         serializer = ProjectSerializer(data=request.data)
@@ -22,6 +76,7 @@ class ProjectListApiView(APIView):
 
 
 class ProjectDetailApiView(APIView):
+    @cached_api_get("project")
     def get(self, request, pk):
         project = get_object_or_404(Project, pk=pk)
         serializer = ProjectSerializer(project)
@@ -50,10 +105,13 @@ class ProjectDetailApiView(APIView):
 
 
 class MaterialListApiView(APIView):
+    @cached_api_get("material")
     def get(self, request):
-        materials = Material.objects.all()
-        serializer = MaterialSerializer(materials, many=True)
-        return Response(serializer.data)
+        try:
+            results, next_cursor = keyset_values_page(request, Material.objects.all(), MaterialSerializer)
+        except InvalidCursor as error:
+            return Response({"detail": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"next": get_next_link(request, next_cursor), "results": results})
 
     def post(self, request):
         serializer = MaterialSerializer(data=request.data)
@@ -64,6 +122,7 @@ class MaterialListApiView(APIView):
 
 
 class MaterialDetailApiView(APIView):
+    @cached_api_get("material")
     def get(self, request, pk):
         material = get_object_or_404(Material, pk=pk)
         serializer = MaterialSerializer(material)
@@ -87,5 +146,253 @@ class MaterialDetailApiView(APIView):
 
     def delete(self, request, pk):
         material = get_object_or_404(Material, pk=pk)
-        material.delete()
+        try:
+            material.delete()
+        except ProtectedError:
+            return Response({"detail": MATERIAL_IN_ARCHIVE_ERROR}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+# maximální počet položek v jednom hromadném požadavku
+MATERIAL_BULK_MAX_ITEMS = getattr(settings, "MATERIAL_BULK_MAX_ITEMS", 5000)
+
+
+class MaterialBulkApiView(APIView):
+    """
+    Hromadné vytvoření (POST), úprava (PATCH) a smazání (DELETE) materiálů. Položky se ověří
+    všechny najednou; při jakékoli chybě se nic neuloží a vrátí se chyby po položkách.
+    """
+    def get_items(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return None, Response({"detail": "Očekává se neprázdný seznam"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > MATERIAL_BULK_MAX_ITEMS:
+            return None, Response(
+                {"detail": f"Nejvýše {MATERIAL_BULK_MAX_ITEMS} položek v jednom požadavku"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return items, None
+
+    def error_response(self, errors):
+        return Response(
+            {"errors": [{"index": index, "errors": item_errors} for index, item_errors in errors]},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    def post(self, request):
+        """Vytvoří seznam materiálů jedním bulk_create"""
+        items, error = self.get_items(request)
+        if error:
+            return error
+        serializers = [MaterialSerializer(data=item) for item in items]
+        errors = [(index, serializer.errors) for index, serializer in enumerate(serializers) if not serializer.is_valid()]
+        if errors:
+            return self.error_response(errors)
+
+        materials = Material.bulk_create_materials([Material(**serializer.validated_data) for serializer in serializers])
+        return Response(MaterialSerializer(materials, many=True).data, status=status.HTTP_201_CREATED)
+
+    def patch(self, request):
+        """Upraví seznam materiálů [{"id": ..., pole...}] jedním bulk_update"""
+        items, error = self.get_items(request)
+        if error:
+            return error
+        ids = [item.get("id") for item in items if isinstance(item, dict)]
+        # opakovaný materiál by se uložil dvakrát a korekce jeho skladu by se zapsala dvakrát
+        duplicate_ids = sorted(pk for pk, count in Counter(pk for pk in ids if isinstance(pk, int)).items() if count > 1)
+        if duplicate_ids:
+            return Response(
+                {"detail": "Materiály se v požadavku opakují", "duplicate_ids": duplicate_ids},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        with transaction.atomic():
+            materials = Material.objects.select_for_update().in_bulk([pk for pk in ids if isinstance(pk, int)])
+            previous = {pk: copy(material) for pk, material in materials.items()}
+
+            errors = []
+            changed = []
+            fields = set()
+            for index, item in enumerate(items):
+                pk = item.get("id") if isinstance(item, dict) else None
+                material = materials.get(pk) if isinstance(pk, int) else None
+                if material is None:
+                    errors.append((index, {"id": ["Materiál neexistuje"]}))
+                    continue
+                serializer = MaterialSerializer(material, data=item, partial=True)
+                if not serializer.is_valid():
+                    errors.append((index, serializer.errors))
+                    continue
+                for field, value in serializer.validated_data.items():
+                    setattr(material, field, value)
+                fields.update(serializer.validated_data)
+                changed.append(material)
+            if errors:
+                return self.error_response(errors)
+
+            Material.bulk_update_materials(changed, fields, previous)
+        return Response(MaterialSerializer(changed, many=True).data)
+
+    def delete(self, request):
+        """Smaže materiály podle seznamu id"""
+        items, error = self.get_items(request)
+        if error:
+            return error
+        try:
+            with transaction.atomic():
+                existing = set(Material.objects.filter(pk__in=[pk for pk in items if isinstance(pk, int)]).values_list("pk", flat=True))
+                errors = [
+                    (index, {"id": ["Materiál neexistuje"]})
+                    for index, pk in enumerate(items)
+                    if not isinstance(pk, int) or pk not in existing
+                ]
+                if errors:
+                    return self.error_response(errors)
+                Material.objects.filter(pk__in=existing).delete()
+        except ProtectedError as error:
+            # smazání se celé vrátí, chyba u položek s materiálem archivovaných řádků
+            protected = {usage.material_id for usage in error.protected_objects}
+            return self.error_response(
+                [(index, {"id": [MATERIAL_IN_ARCHIVE_ERROR]}) for index, pk in enumerate(items) if pk in protected]
+            )
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MaterialStockApiView(APIView):
+    def get(self, request, pk):
+        """Stav skladu materiálu k okamžiku ?at= (ISO 8601), bez parametru aktuální"""
+        material = get_object_or_404(Material, pk=pk)
+        at = request.query_params.get("at")
+        try:
+            when = parse_datetime(at) if at else timezone.now()
+        except ValueError:
+            when = None
+        if when is None:
+            return Response({"at": ["Neplatné datum a čas"]}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(when):
+            when = timezone.make_aware(when)
+        return Response({"material": material.pk, "at": when, "quantity": material.stock_at(when)})
+
+
+class DailyLogListApiView(APIView):
+    def get(self, request):
+        """
+        Denní záznamy filtrované podle ?q=&project=&date_from=&date_to=&status=, od nejnovějších.
+        S ?expand=usages včetně řádků materiálu.
+        """
+        filter_form = DailyLogFilterForm(request.query_params)
+        if not filter_form.is_valid():
+            return Response(filter_form.errors, status=status.HTTP_400_BAD_REQUEST)
+        if request.query_params.get("expand") == "usages":
+            return self.get_with_usages(request, filter_form)
+        try:
+            results, next_cursor = keyset_values_page(
+                request, daily_log_querysets(filter_form), DailyLogSerializer,
+                ordering=filter_form.get_ordering(),
+            )
+        except InvalidCursor as error:
+            return Response({"detail": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"next": get_next_link(request, next_cursor), "results": results})
+
+    def get_with_usages(self, request, filter_form):
+        try:
+            daily_logs, next_cursor = keyset_page(
+                request,
+                [model.with_usages(queryset) for model, queryset in zip(
+                    (DailyLog, ArchivedDailyLog), daily_log_querysets(filter_form)
+                )],
+                ordering=filter_form.get_ordering(),
+            )
+        except InvalidCursor as error:
+            return Response({"detail": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = DailyLogDetailSerializer(daily_logs, many=True)
+        return Response({"next": get_next_link(request, next_cursor), "results": serializer.data})
+
+    def post(self, request):
+        """Vytvoří denní záznam s vnořenými řádky materiálu ("usages": [{"material", "used_quantity"}])"""
+        serializer = DailyLogCreateSerializer(data=request.data)
+        if serializer.is_valid():
+            daily_log = serializer.save()
+            daily_log = DailyLog.with_usages().get(pk=daily_log.pk)
+            return Response(DailyLogDetailSerializer(daily_log).data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class DailyLogDetailApiView(APIView):
+    def get(self, request, pk):
+        daily_log = DailyLog.with_usages().filter(pk=pk).first()
+        if daily_log is None:
+            daily_log = get_object_or_404(ArchivedDailyLog.with_usages(), pk=pk)
+        return Response(DailyLogDetailSerializer(daily_log).data)
+
+
+class DailyLogSearchApiView(APIView):
+    def get(self, request):
+        """Fulltextové hledání v názvech a popisech denních záznamů (?q=), seřazené podle relevance"""
+        filter_form = DailyLogFilterForm(request.query_params)
+        if not filter_form.is_valid():
+            return Response(filter_form.errors, status=status.HTTP_400_BAD_REQUEST)
+        if not filter_form.cleaned_data["q"].strip():
+            return Response({"q": ["Zadejte hledaný text"]}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            daily_logs, next_cursor = keyset_page(
+                request, daily_log_querysets(filter_form), ordering=filter_form.get_ordering()
+            )
+        except InvalidCursor as error:
+            return Response({"detail": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        results = [
+            {**DailyLogSerializer(daily_log).data, "rank": daily_log.search_rank}
+            for daily_log in daily_logs
+        ]
+        return Response({"next": get_next_link(request, next_cursor), "results": results})
+
+
+class ProjectAnalyticsApiView(APIView):
+    def get(self, request):
+        """Náklady a odpracovaný čas projektů po ?period=week|month s průběžnými součty"""
+        filter_form = AnalyticsFilterForm(request.query_params)
+        if not filter_form.is_valid():
+            return Response(filter_form.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = filter_form.cleaned_data
+        return Response({
+            "period": data["period"],
+            "results": project_series(
+                data["period"], projects=data["project"], date_from=data["date_from"], date_to=data["date_to"]
+            ),
+        })
+
+
+class MaterialAnalyticsApiView(APIView):
+    def get(self, request):
+        """Spotřeba a náklady materiálů po ?period=week|month s průběžnými součty"""
+        filter_form = AnalyticsFilterForm(request.query_params)
+        if not filter_form.is_valid():
+            return Response(filter_form.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = filter_form.cleaned_data
+        return Response({
+            "period": data["period"],
+            "results": material_series(
+                data["period"], projects=data["project"], materials=data["material"],
+                date_from=data["date_from"], date_to=data["date_to"],
+            ),
+        })
+
+
+class ApiCacheStatsView(APIView):
+    def get(self, request):
+        """Počty zásahů a minutí cache API odpovědí"""
+        return Response(get_stats())
+
+
+class RecomputeQueueStatsView(APIView):
+    def get(self, request):
+        """Hloubka fronty přepočtů a zpoždění nejstarší splatné úlohy"""
+        return Response(RecomputeJob.stats())
+
+
+class DailyLogIngestApiView(APIView):
+    def post(self, request):
+        """
+        Hromadný import denních záznamů z NDJSON těla (jeden záznam s řádky "usages" na řádek).
+        Tělo se čte průběžně a zapisuje po dávkách pevné velikosti.
+        """
+        return Response(ingest_ndjson(request.stream))
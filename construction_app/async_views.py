@@ -0,0 +1,78 @@
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Project, Material
+from .pagination import InvalidCursor, apaginate_keyset, get_page_size
+from .serializers import ProjectSerializer, MaterialSerializer
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    """
+    JSON odpověď vykreslená stejně jako v DRF pohledech (stejné bajty).
+    """
+    return HttpResponse(JSONRenderer().render(data), content_type="application/json", status=status)
+
+
+class AsyncListApiView(View):
+    """
+    Asynchronní čtení seznamu přes async ORM - pod ASGI nezabírá vlákno na požadavek.
+    """
+    model = None
+    serializer_class = None
+
+    async def get(self, request):
+        try:
+            objects, next_cursor = await apaginate_keyset(
+                self.model.objects.all(),
+                ("pk",),
+                request.GET.get("cursor"),
+                get_page_size(request.GET.get("page_size")),
+            )
+        except InvalidCursor as error:
+            return json_response({"detail": str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        next_link = None
+        if next_cursor:
+            next_link = replace_query_param(request.build_absolute_uri(), "cursor", next_cursor)
+        return json_response({
+            "next": next_link,
+            "results": [self.serializer_class(obj).data for obj in objects],
+        })
+
+
+class AsyncDetailApiView(View):
+    model = None
+    serializer_class = None
+
+    async def get(self, request, pk):
+        try:
+            obj = await self.model.objects.aget(pk=pk)
+        except self.model.DoesNotExist:
+            return json_response(
+                {"detail": f"No {self.model._meta.object_name} matches the given query."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return json_response(self.serializer_class(obj).data)
+
+
+class AsyncProjectListApiView(AsyncListApiView):
+    model = Project
+    serializer_class = ProjectSerializer
+
+
+class AsyncProjectDetailApiView(AsyncDetailApiView):
+    model = Project
+    serializer_class = ProjectSerializer
+
+
+class AsyncMaterialListApiView(AsyncListApiView):
+    model = Material
+    serializer_class = MaterialSerializer
+
+
+class AsyncMaterialDetailApiView(AsyncDetailApiView):
+    model = Material
+    serializer_class = MaterialSerializer
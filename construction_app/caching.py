@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+# alias cache z settings.CACHES (locmem, souborová, ...) a doba platnosti odpovědí v sekundách
+API_CACHE_ALIAS = getattr(settings, "API_CACHE_ALIAS", "default")
+API_CACHE_TIMEOUT = getattr(settings, "API_CACHE_TIMEOUT", 300)
+# alias cache pro fragmenty řádků HTML seznamů a jejich doba platnosti; verze objektů v klíčích
+# fragmentů jsou ve sdílené API cache, fragmenty samotné proto mohou být v paměti procesu
+ROW_CACHE_ALIAS = getattr(settings, "ROW_CACHE_ALIAS", API_CACHE_ALIAS)
+ROW_CACHE_TIMEOUT = getattr(settings, "ROW_CACHE_TIMEOUT", 300)
+
+
+def get_cache():
+    return caches[API_CACHE_ALIAS]
+
+
+def get_row_cache():
+    return caches[ROW_CACHE_ALIAS]
+
+
+def get_version(key):
+    """
+    Aktuální verze (náhodný token) - změnou verze se zneplatní všechny klíče, které ji obsahují.
+    """
+    return get_cache().get_or_set(key, uuid.uuid4().hex, None)
+
+
+def get_versions(keys):
+    """
+    Jako get_version pro více klíčů - jedním get_many, chybějící verze se založí přes add.
+    """
+    cache = get_cache()
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    for key in missing:
+        cache.add(key, uuid.uuid4().hex, None)
+    if missing:
+        versions.update(cache.get_many(missing))
+    return versions
+
+
+def attach_row_versions(objects, related=()):
+    """
+    Doplní objektům stránky (a jejich souvisejícím objektům z related) atribut row_version
+    s verzí z invalidate() - klíč fragmentu řádku šablony ({% cache ... obj.pk obj.row_version %})
+    se tak při uložení nebo smazání objektu změní a vykreslí se znovu jen změněné řádky.
+    """
+    instances = list(objects)
+    instances += [getattr(obj, name) for obj in objects for name in related if getattr(obj, name) is not None]
+    keys = {id(obj): f"api:{obj._meta.model_name}:{obj.pk}:version" for obj in instances}
+    versions = get_versions(list(set(keys.values())))
+    for obj in instances:
+        obj.row_version = versions.get(keys[id(obj)])
+
+
+class RowCacheMixin:
+    """
+    Mixin pro ListView se stránkou v object_list - doplní řádkům verze (attach_row_versions)
+    a šabloně row_cache_timeout a row_cache_alias pro tag {% cache %}.
+    """
+    row_cache_related = ()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        attach_row_versions(context["object_list"], self.row_cache_related)
+        context["row_cache_timeout"] = ROW_CACHE_TIMEOUT
+        context["row_cache_alias"] = ROW_CACHE_ALIAS
+        return context
+
+
+def invalidate(resource, pk=None):
+    """
+    Zneplatní uložené odpovědi zdroje: seznamy vždy, detail jen pro daný objekt.
+    """
+    invalidate_many(resource, [] if pk is None else [pk])
+
+
+def invalidate_many(resource, pks):
+    """
+    Zneplatní seznamy a detaily daných objektů až po potvrzení transakce, aby se do cache
+    mezitím neuložila data, která ještě nejsou vidět.
+    """
+    keys = [f"api:{resource}:{pk}:version" for pk in pks]
+    keys.append(f"api:{resource}:list:version")
+    transaction.on_commit(
+        lambda: get_cache().set_many({key: uuid.uuid4().hex for key in keys}, None)
+    )
+
+
+def get_cache_key(resource, request, pk=None):
+    if pk is not None:
+        version = get_version(f"api:{resource}:{pk}:version")
+        return f"api:{resource}:{pk}:{version}"
+    version = get_version(f"api:{resource}:list:version")
+    query = hashlib.md5(request.META.get("QUERY_STRING", "").encode()).hexdigest()
+    return f"api:{resource}:list:{version}:{query}"
+
+
+def compute_etag(data):
+    payload = json.dumps(data, cls=JSONEncoder, sort_keys=True, ensure_ascii=False)
+    return f'"{hashlib.sha256(payload.encode()).hexdigest()}"'
+
+
+# počty zásahů a minutí se drží v paměti procesu - zápis do sdílené cache (add + incr) při každém
+# GET by byl na souborové cache neatomický a každý set v ní navíc prochází celý adresář (_cull)
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def record(counter):
+    with _stats_lock:
+        _stats[counter] += 1
+
+
+def get_stats():
+    """
+    Počty zásahů a minutí cache API odpovědí v tomto procesu (workeru) od jeho spuštění.
+    """
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    return {
+        "process": os.getpid(),
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / (hits + misses), 3) if hits + misses else None,
+    }
+
+
+def locmem_caches(prefix):
+    """
+    Kopie settings.CACHES, ve které je každý alias LocMemCache vlastní pro proces - pro testy
+    a benchmark, které cache mažou a nesmí sahat na sdílenou cache běžícího serveru.
+    """
+    return {
+        alias: {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": f"{prefix}-{alias}",
+            "OPTIONS": {
+                key: value for key, value in config.get("OPTIONS", {}).items()
+                if key in ("MAX_ENTRIES", "CULL_FREQUENCY")
+            },
+        }
+        for alias, config in settings.CACHES.items()
+    }
+
+
+def cached_api_get(resource):
+    """
+    Dekorátor pro APIView.get - ukládá data odpovědi s ETag do cache a na shodný
+    If-None-Match vrací 304 bez dotazu do databáze i serializace.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            cache = get_cache()
+            key = get_cache_key(resource, request, kwargs.get("pk"))
+            entry = cache.get(key)
+            if entry is None:
+                record("misses")
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                etag = compute_etag(response.data)
+                cache.set(key, (etag, response.data), API_CACHE_TIMEOUT)
+            else:
+                record("hits")
+                etag, data = entry
+                response = Response(data)
+
+            if etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            response["ETag"] = etag
+            return response
+        return wrapper
+    return decorator
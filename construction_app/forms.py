@@ -1,10 +1,14 @@
+from collections import defaultdict
 from datetime import timedelta
 
 from django import forms
 from django.core.exceptions import ValidationError
-from django.forms import inlineformset_factory
+from django.forms import BaseInlineFormSet, inlineformset_factory
+from django.utils.functional import cached_property
 
 from .models import Project, Material, DailyLog, MaterialUsage
+from .photos import identify_photo
+from .search import search_daily_logs
 
 
 class ProjectForm(forms.ModelForm):
@@ -44,10 +48,132 @@ class DailyLogForm(forms.ModelForm):
         return instance
 
 
+class DailyLogFilterForm(forms.Form):
+    q = forms.CharField(required=False, max_length=200, label="Hledat")
+    project = forms.ModelChoiceField(queryset=Project.objects.all(), required=False, label="Projekt")
+    date_from = forms.DateField(required=False, label="Od")
+    date_to = forms.DateField(required=False, label="Do")
+    status = forms.ChoiceField(choices=[("", "---------")] + Project.STATUS_CHOICES, required=False, label="Stav projektu")
+
+    def filter(self, queryset):
+        """
+        Omezí denní záznamy podle vyplněných polí (využívá index (project_id, date)).
+        """
+        if not self.is_valid():
+            return queryset
+        data = self.cleaned_data
+        if data["project"]:
+            queryset = queryset.filter(project=data["project"])
+        if data["date_from"]:
+            queryset = queryset.filter(date__gte=data["date_from"])
+        if data["date_to"]:
+            queryset = queryset.filter(date__lte=data["date_to"])
+        if data["status"]:
+            queryset = queryset.filter(project__status=data["status"])
+        if data["q"].strip():
+            queryset = search_daily_logs(queryset, data["q"].strip())
+        return queryset
+
+    def get_ordering(self, default=("-date", "-pk")):
+        """
+        Řazení pro stránkování - při hledání nejdřív podle relevance.
+        """
+        if self.is_valid() and self.cleaned_data["q"].strip():
+            return ("-search_rank",) + tuple(default)
+        return default
+
+
+class IntegerListField(forms.Field):
+    """
+    Opakovaný parametr (?project=1&project=2) jako seznam celých čísel - bez dotazu do databáze.
+    """
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        try:
+            return [int(item) for item in value or []]
+        except (TypeError, ValueError):
+            raise ValidationError("Zadejte celá čísla")
+
+
+class AnalyticsFilterForm(forms.Form):
+    period = forms.ChoiceField(choices=[("month", "Měsíc"), ("week", "Týden")], required=False, label="Období")
+    project = IntegerListField(required=False, label="Projekty")
+    material = IntegerListField(required=False, label="Materiály")
+    date_from = forms.DateField(required=False, label="Od")
+    date_to = forms.DateField(required=False, label="Do")
+
+    def clean_period(self):
+        return self.cleaned_data["period"] or "month"
+
+
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleFileField(forms.FileField):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("widget", MultipleFileInput(attrs={"accept": "image/*"}))
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        single_file_clean = super().clean
+        if isinstance(data, (list, tuple)):
+            return [single_file_clean(file, initial) for file in data]
+        return [single_file_clean(data, initial)]
+
+
+class DailyLogPhotoForm(forms.Form):
+    photos = MultipleFileField(label="Fotografie")
+
+    def clean_photos(self):
+        photos = self.cleaned_data["photos"]
+        for photo in photos:
+            # rozhoduje obsah souboru, ne content_type ani přípona od klienta
+            if identify_photo(photo) is None:
+                raise ValidationError(f"Soubor {photo.name} není podporovaný obrázek (JPEG, PNG, WebP, GIF)")
+        return photos
+
+
+class MaterialChoiceField(forms.ModelChoiceField):
+    """
+    Výběr materiálu, který hodnotu hledá v materiálech načtených formsetem jedním dotazem
+    (materials) místo dotazu za každý řádek.
+    """
+    materials = None
+
+    def to_python(self, value):
+        if self.materials is None or value in self.empty_values:
+            return super().to_python(value)
+        try:
+            return self.materials[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(self.error_messages["invalid_choice"], code="invalid_choice", params={"value": value})
+
+
 class MaterialUsageForm(forms.ModelForm):
+    """
+    Materiál je deklarované pole mimo Meta.fields - model ho proto při full_clean() neověřuje
+    dalším dotazem (existenci ověřilo pole formuláře) a do instance se přiřadí v clean().
+    """
+    material = MaterialChoiceField(queryset=Material.objects.all())
+    field_order = ["material", "used_quantity"]
+
     class Meta:
         model = MaterialUsage
-        fields = "__all__"
+        fields = ("used_quantity",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.material_id:
+            self.initial.setdefault("material", self.instance.material_id)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("material"):
+            # před ověřením modelu (MaterialUsage.clean kontroluje sklad materiálu)
+            self.instance.material = cleaned_data["material"]
+        return cleaned_data
 
     def clean_used_quantity(self):
         """
@@ -61,9 +187,80 @@ class MaterialUsageForm(forms.ModelForm):
         return used_quantity
 
 
+class BaseMaterialUsageFormSet(BaseInlineFormSet):
+    @cached_property
+    def materials(self):
+        """
+        Materiály všech vyplněných řádků jedním dotazem {pk: Material}.
+        """
+        pks = set()
+        for index in range(self.total_form_count()):
+            try:
+                pks.add(int(self.data.get(f"{self.add_prefix(index)}-material")))
+            except (TypeError, ValueError):
+                continue
+        return self.form.base_fields["material"].queryset.in_bulk(pks)
+
+    @cached_property
+    def material_choices(self):
+        """
+        Volby výběru materiálu načtené jednou pro všechny řádky.
+        """
+        return list(self.form.base_fields["material"].choices)
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        field = form.fields["material"]
+        # volby se načtou až při vykreslení, a pak jen jednou pro všechny řádky
+        field.choices = lambda: self.material_choices
+        if self.is_bound:
+            field.materials = self.materials
+
+    def is_deleted(self, form):
+        return self.can_delete and form.cleaned_data.get("DELETE", False)
+
+    def get_usages(self):
+        """
+        Vrátí neuložené instance MaterialUsage z vyplněných a nesmazaných formulářů.
+        """
+        return [
+            form.save(commit=False)
+            for form in self.forms
+            if form.has_changed() and not self.is_deleted(form)
+        ]
+
+    def clean(self):
+        """
+        Ověří dostupné množství pro součet všech řádků se stejným materiálem.
+        """
+        super().clean()
+        demand = defaultdict(int)
+        materials = {}
+        for form in self.forms:
+            if not hasattr(form, "cleaned_data") or self.is_deleted(form):
+                continue
+            material = form.cleaned_data.get("material")
+            used_quantity = form.cleaned_data.get("used_quantity")
+            if material and used_quantity:
+                demand[material.pk] += used_quantity
+                materials[material.pk] = material
+
+        for material_pk, used_quantity in demand.items():
+            if used_quantity > materials[material_pk].quantity:
+                raise ValidationError(f"Nedostatečné množství materiálu: {materials[material_pk].name}")
+
+    def save_bulk(self):
+        """
+        Uloží všechny řádky najednou přes MaterialUsage.bulk_create_for_log.
+        """
+        return MaterialUsage.bulk_create_for_log(self.instance, self.get_usages())
+
+
 MaterialUsageFormSet = forms.inlineformset_factory(
     DailyLog,
     MaterialUsage,
-    fields=("material", "used_quantity"),
+    form=MaterialUsageForm,
+    formset=BaseMaterialUsageFormSet,
+    fields=("used_quantity",),
     extra=1
 )
@@ -0,0 +1,154 @@
+import json
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Project, Material, DailyLog, MaterialUsage, ProjectDailySummary
+from .search import update_search_vectors
+from .serializers import DailyLogIngestSerializer
+
+# počet záznamů zapsaných v jedné transakci
+INGEST_BATCH_SIZE = getattr(settings, "INGEST_BATCH_SIZE", 500)
+
+
+def iter_ndjson(stream):
+    """
+    Postupně čte NDJSON proud po řádcích, aniž by načetl celé tělo do paměti.
+    Vrací dvojice (číslo řádku, záznam nebo None při neplatném JSON).
+    """
+    if stream is None:
+        return
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError:
+            yield line_number, None
+
+
+def ingest_batch(batch):
+    """
+    Zapíše dávku záznamů [(číslo řádku, data)] v jedné transakci a vrátí výsledky po záznamech.
+    Projekty a materiály se načítají jedním dotazem na dávku, materiály se zamknou a sklad
+    se rozděluje v pořadí záznamů, takže chybný záznam neshodí zbytek dávky.
+    """
+    results = {}
+    valid = []
+    for line_number, record in batch:
+        if record is None:
+            results[line_number] = {"line": line_number, "errors": {"non_field_errors": ["Neplatný JSON"]}}
+            continue
+        serializer = DailyLogIngestSerializer(data=record)
+        if serializer.is_valid():
+            valid.append((line_number, serializer.validated_data))
+        else:
+            results[line_number] = {"line": line_number, "errors": serializer.errors}
+
+    with transaction.atomic():
+        projects = Project.objects.in_bulk({data["project"] for _, data in valid})
+        materials = Material.objects.select_for_update().in_bulk(
+            {usage["material"] for _, data in valid for usage in data["usages"]}
+        )
+        available = {pk: material.quantity for pk, material in materials.items()}
+
+        accepted = []
+        for line_number, data in valid:
+            demand = defaultdict(int)
+            for usage in data["usages"]:
+                demand[usage["material"]] += usage["used_quantity"]
+
+            errors = {}
+            if data["project"] not in projects:
+                errors["project"] = ["Projekt neexistuje"]
+            missing = [pk for pk in demand if pk not in materials]
+            if missing:
+                errors["usages"] = [f"Materiál neexistuje: {pk}" for pk in missing]
+            elif any(quantity > available[pk] for pk, quantity in demand.items()):
+                errors["usages"] = ["Nedostatečné množství materiálu"]
+            if errors:
+                results[line_number] = {"line": line_number, "errors": errors}
+                continue
+
+            for pk, quantity in demand.items():
+                available[pk] -= quantity
+            accepted.append((line_number, data))
+
+        daily_logs = DailyLog.objects.bulk_create([
+            DailyLog(
+                project=projects[data["project"]],
+                title=data.get("title"),
+                description=data.get("description"),
+                date=data["date"],
+                work_time=data["work_time"],
+                temperature=data.get("temperature"),
+            )
+            for _, data in accepted
+        ])
+        update_search_vectors(DailyLog.objects.filter(pk__in=[daily_log.pk for daily_log in daily_logs]))
+
+        usages = []
+        costs = defaultdict(int)
+        summaries = {}
+        for (line_number, data), daily_log in zip(accepted, daily_logs):
+            summary = summaries.setdefault((daily_log.project_id, daily_log.date), {
+                "log_count": 0, "work_time": timedelta(0), "temperature_sum": 0, "temperature_count": 0,
+                "material_cost": 0, "usage_count": 0,
+            })
+            for field, value in ProjectDailySummary.log_deltas(daily_log, 1).items():
+                summary[field] += value
+            for usage in data["usages"]:
+                material_usage = MaterialUsage(
+                    daily_log=daily_log,
+                    material=materials[usage["material"]],
+                    used_quantity=usage["used_quantity"],
+                )
+                costs[daily_log.project_id] += material_usage.cost()
+                summary["material_cost"] += material_usage.cost()
+                summary["usage_count"] += 1
+                usages.append(material_usage)
+            results[line_number] = {"line": line_number, "id": daily_log.pk}
+
+        MaterialUsage.objects.bulk_create(usages)
+        Material.withdraw_stock_bulk({
+            pk: materials[pk].quantity - quantity
+            for pk, quantity in available.items()
+            if quantity != materials[pk].quantity
+        })
+        for project_id, cost in costs.items():
+            Project.apply_cost_delta(project_id, cost)
+        for (project_id, date), deltas in summaries.items():
+            ProjectDailySummary.apply_delta(project_id, date, **deltas)
+
+    return [results[line_number] for line_number, _ in batch]
+
+
+def ingest_ndjson(stream, batch_size=INGEST_BATCH_SIZE):
+    """
+    Importuje denní záznamy s řádky materiálu z NDJSON proudu po dávkách pevné velikosti.
+    Vrátí výsledky po záznamech a souhrn s propustností.
+    """
+    started = time.monotonic()
+    results = []
+    batch = []
+    for item in iter_ndjson(stream):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            results.extend(ingest_batch(batch))
+            batch = []
+    if batch:
+        results.extend(ingest_batch(batch))
+
+    elapsed = time.monotonic() - started
+    created = sum(1 for result in results if "id" in result)
+    return {
+        "created": created,
+        "failed": len(results) - created,
+        "elapsed_seconds": round(elapsed, 3),
+        "records_per_second": round(len(results) / elapsed, 1) if elapsed else None,
+        "results": results,
+    }
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef
+
+from construction_app.models import ARCHIVE_BATCH_SIZE, ArchivedDailyLog, DailyLog, Project, ProjectArchive
+
+
+class Command(BaseCommand):
+    help = (
+        "Přesune denní záznamy, řádky materiálu a fotografie dokončených projektů do archivních tabulek "
+        "a uloží souhrn projektu (spouštět periodicky, např. z cronu). S --restore je vrátí zpět."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--project",
+            action="append",
+            help="Slug projektu (lze zadat vícekrát), jinak všechny dokončené projekty s aktivními záznamy",
+        )
+        parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="Počet řádků v jednom INSERT")
+        parser.add_argument("--restore", action="store_true", help="Vrátí archivované záznamy zpět")
+
+    def handle(self, *args, **options):
+        if options["project"]:
+            projects = Project.objects.filter(slug__in=options["project"])
+            missing = set(options["project"]) - set(projects.values_list("slug", flat=True))
+            if missing:
+                raise CommandError(f"Neznámé projekty: {', '.join(sorted(missing))}")
+        elif options["restore"]:
+            projects = Project.objects.filter(Exists(ArchivedDailyLog.objects.filter(project=OuterRef("pk"))))
+        else:
+            projects = Project.objects.filter(
+                Exists(DailyLog.objects.filter(project=OuterRef("pk"))), status="completed"
+            )
+
+        done = 0
+        # každý projekt ve vlastní transakci
+        for project in projects.order_by("pk"):
+            if options["restore"]:
+                restored = ProjectArchive.restore(project, options["batch_size"])
+                self.stdout.write(f"{project}: vráceno záznamů {restored}")
+            else:
+                archive = ProjectArchive.archive(project, options["batch_size"])
+                if archive is None:
+                    self.stdout.write(self.style.WARNING(f"{project}: projekt není dokončený, přeskočeno"))
+                    continue
+                self.stdout.write(f"{project}: archivováno, celkem záznamů {archive.log_count}")
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f"Hotovo, projektů: {done}"))
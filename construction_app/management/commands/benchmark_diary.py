@@ -0,0 +1,322 @@
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.template.loader import render_to_string
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from django.utils import timezone
+
+from construction_app import caching
+from construction_app.models import Project, Material, DailyLog
+from construction_app.serializers import DailyLogSerializer, fast_list_data, fast_list_fields
+
+
+# export reportu v samostatném procesu - špička RSS zahrnuje i buffery databázového ovladače,
+# které tracemalloc nevidí (nestreamovaný export by se projevil právě tam)
+EXPORT_PEAK_RSS_SCRIPT = """
+import resource, sys
+import django
+from django.conf import settings
+settings.DATABASES["default"]["NAME"] = sys.argv[1]
+django.setup()
+from construction_app.models import Project
+from construction_app.reports import iter_project_report_csv
+project = Project.objects.get(pk=sys.argv[2])
+def peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+before = peak_rss_kb()
+rows = sum(1 for _ in iter_project_report_csv(project))
+print(rows, before, peak_rss_kb())
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Změří čas a počet dotazů klíčových pohledů nad daty ze seed_diary pro několik velikostí "
+        "a výsledky uloží jako JSON. Běží nad dočasnou testovací databází."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", default="100,1000,10000", help="Počty denních záznamů oddělené čárkou (např. 10000,100000)"
+        )
+        parser.add_argument("--projects", type=int, default=20, help="Počet projektů")
+        parser.add_argument("--materials", type=int, default=50, help="Počet materiálů")
+        parser.add_argument("--usages-per-log", type=int, default=3, help="Počet použitých materiálů na záznam")
+        parser.add_argument("--repeat", type=int, default=5, help="Počet opakování každého měření")
+        parser.add_argument("--seed", type=int, default=42, help="Semínko generátoru dat")
+        parser.add_argument("--threads", type=int, default=8, help="Počet vláken pro zátěž skladu")
+        parser.add_argument(
+            "--render-rows", type=int, default=5000, help="Počet řádků HTML seznamů při měření cache fragmentů"
+        )
+        parser.add_argument("--output", default="benchmark-results.json", help="Soubor s výsledky")
+
+    def handle(self, *args, **options):
+        self.repeat = options["repeat"]
+        self.client = Client(HTTP_HOST="localhost")
+        results = []
+
+        # měření cache maže - místo sdílené cache serveru se použije LocMemCache tohoto procesu
+        cache_override = override_settings(CACHES=caching.locmem_caches("benchmark"))
+        cache_override.enable()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            for size in [int(size) for size in options["sizes"].split(",")]:
+                call_command("flush", interactive=False, verbosity=0)
+                call_command(
+                    "seed_diary",
+                    projects=options["projects"],
+                    materials=options["materials"],
+                    logs=size,
+                    usages_per_log=options["usages_per_log"],
+                    seed=options["seed"],
+                    stdout=self.stdout if options["verbosity"] > 1 else io.StringIO(),
+                )
+                for scenario, measure in self.get_scenarios(options):
+                    result = {"size": size, "scenario": scenario, **measure()}
+                    results.append(result)
+                    self.stdout.write(f"{size:>8} {scenario:<32} {json.dumps(result, default=str)}")
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            cache_override.disable()
+
+        report = {
+            "meta": {
+                "created": timezone.now().isoformat(),
+                "database": connection.vendor,
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "options": {
+                    key: options[key]
+                    for key in ("sizes", "projects", "materials", "usages_per_log", "repeat", "seed", "threads", "render_rows")
+                },
+            },
+            "results": results,
+        }
+        with open(options["output"], "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2, default=str)
+        self.stdout.write(self.style.SUCCESS(f"Výsledky uloženy do {options['output']}"))
+
+    def get_scenarios(self, options):
+        project = Project.objects.order_by("-total_cost").first()
+        material = Material.objects.order_by("pk").first()
+        rows = options["render_rows"]
+        return [
+            ("ProjectListView", lambda: self.measure_get(reverse("projects"))),
+            ("DailyLogListView", lambda: self.measure_get(reverse("daily_logs"))),
+            ("DailyLogCreateView POST", lambda: self.measure(self.post_daily_log)),
+            ("api projects list", lambda: self.measure_get(reverse("projects-api"))),
+            ("api project detail", lambda: self.measure_get(reverse("project-api", args=[project.pk]))),
+            ("api materials list", lambda: self.measure_get(reverse("materials-api"))),
+            ("api material detail", lambda: self.measure_get(reverse("material-api", args=[material.pk]))),
+            ("api daily logs list", lambda: self.measure_get(reverse("daily_logs-api"))),
+            ("api project analytics month", lambda: self.measure_get(reverse("project-analytics-api") + "?period=month")),
+            ("api project analytics week", lambda: self.measure_get(reverse("project-analytics-api") + "?period=week")),
+            ("api material analytics month", lambda: self.measure_get(reverse("material-analytics-api") + "?period=month")),
+            ("Project.update_total_cost", lambda: self.measure(project.update_total_cost)),
+            ("project report export", lambda: self.measure_export(project)),
+            ("serialize daily logs", lambda: self.measure_serialization(DailyLogSerializer, DailyLog.objects.order_by("pk"))),
+            ("stock contention", lambda: self.measure_stock_contention(options["threads"])),
+            ("render project rows", lambda: self.measure_row_cache(
+                "construction_app/project_list.html", "projects",
+                Project.objects.select_related("archive").order_by("pk")[:rows],
+            )),
+            ("render material rows", lambda: self.measure_row_cache(
+                "construction_app/material_list.html", "materials", Material.objects.order_by("pk")[:rows],
+            )),
+            ("render daily log rows", lambda: self.measure_row_cache(
+                "construction_app/daily_log_list.html", "daily_logs",
+                DailyLog.objects.select_related("project").prefetch_related("photos__photo").order_by("-date", "-pk")[:rows],
+                related=("project",),
+            )),
+        ]
+
+    def measure(self, action):
+        """
+        Opakovaně provede akci a vrátí časy v ms a počet SQL dotazů posledního běhu.
+        """
+        timings = []
+        for _ in range(self.repeat):
+            # API odpovědi se měří bez cache
+            caching.get_cache().clear()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                action()
+                timings.append((time.perf_counter() - started) * 1000)
+        return {
+            "queries": len(queries.captured_queries),
+            "median_ms": round(statistics.median(timings), 3),
+            "min_ms": round(min(timings), 3),
+            "max_ms": round(max(timings), 3),
+        }
+
+    def measure_get(self, url):
+        def action():
+            response = self.client.get(url)
+            assert response.status_code == 200, f"{url}: {response.status_code}"
+        return self.measure(action)
+
+    def post_daily_log(self):
+        project = Project.objects.order_by("pk").first()
+        materials = list(Material.objects.order_by("-quantity")[:5])
+        data = {
+            "project": project.pk,
+            "title": "Benchmark",
+            "date": timezone.localdate().isoformat(),
+            "work_time_in_minutes": 60,
+            "daily_usages-TOTAL_FORMS": len(materials),
+            "daily_usages-INITIAL_FORMS": 0,
+        }
+        for number, material in enumerate(materials):
+            data[f"daily_usages-{number}-material"] = material.pk
+            data[f"daily_usages-{number}-used_quantity"] = 1
+        response = self.client.post(reverse("daily_log-create"), data)
+        assert response.status_code == 302, f"DailyLogCreateView: {response.status_code}"
+
+    def measure_export(self, project):
+        """
+        Export reportu v novém procesu - čas, počet řádků a špička RSS procesu před exportem
+        a po něm. In-memory testovací databázi (SQLite) jiný proces nevidí, paměť se pak neměří.
+        """
+        database_name = connection.settings_dict["NAME"]
+        if connection.vendor == "sqlite" and connection.creation.is_in_memory_db(database_name):
+            return {"peak_rss_kb": None, "note": "in-memory databáze, export se v jiném procesu neměří"}
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-c", EXPORT_PEAK_RSS_SCRIPT, str(database_name), str(project.pk)],
+            env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        elapsed = (time.perf_counter() - started) * 1000
+        rows, rss_before, rss_peak = (int(value) for value in completed.stdout.split())
+        return {
+            "rows": rows,
+            "process_ms": round(elapsed, 3),
+            "rss_before_export_kb": rss_before,
+            "peak_rss_kb": rss_peak,
+            "export_rss_growth_kb": rss_peak - rss_before,
+        }
+
+    def measure_serialization(self, serializer_class, queryset):
+        """
+        Celý seznam přes ModelSerializer a přes rychlou cestu values_list() - časy obou,
+        zrychlení a kontrola, že vykreslený JSON je bajtově shodný.
+        """
+        _, lookups, _ = fast_list_fields(serializer_class)
+        renderer = JSONRenderer()
+
+        def model_serializer():
+            return renderer.render(serializer_class(queryset.all(), many=True).data)
+
+        def fast_path():
+            return renderer.render(fast_list_data(serializer_class, queryset.values_list(*lookups)))
+
+        timings = {}
+        for name, action in (("model_serializer", model_serializer), ("fast", fast_path)):
+            runs = []
+            for _ in range(self.repeat):
+                started = time.perf_counter()
+                output = action()
+                runs.append((time.perf_counter() - started) * 1000)
+            timings[name] = (statistics.median(runs), output)
+
+        return {
+            "rows": queryset.count(),
+            "model_serializer_ms": round(timings["model_serializer"][0], 3),
+            "median_ms": round(timings["fast"][0], 3),
+            "speedup": round(timings["model_serializer"][0] / timings["fast"][0], 2),
+            "identical": timings["model_serializer"][1] == timings["fast"][1],
+        }
+
+    def measure_row_cache(self, template_name, context_name, queryset, related=()):
+        """
+        Vykreslení seznamu s fragmenty řádků v cache: studená cache (všechny řádky se vykreslí
+        a uloží), teplá cache a teplá cache po změně verze jednoho řádku. Kontroluje, že studené
+        a teplé HTML je shodné.
+        """
+        objects = list(queryset)
+        context = {
+            context_name: objects,
+            "row_cache_timeout": caching.ROW_CACHE_TIMEOUT,
+            "row_cache_alias": caching.ROW_CACHE_ALIAS,
+        }
+        timings = {"cold": [], "warm": [], "one_changed": []}
+        outputs = {}
+        for _ in range(self.repeat):
+            caching.get_cache().clear()
+            caching.get_row_cache().clear()
+            caching.attach_row_versions(objects, related)
+            for name in ("cold", "warm", "one_changed"):
+                if name == "one_changed" and objects:
+                    # stejně jako caching.invalidate() - nová verze jednoho objektu
+                    objects[0].row_version = uuid.uuid4().hex
+                started = time.perf_counter()
+                outputs[name] = render_to_string(template_name, context)
+                timings[name].append((time.perf_counter() - started) * 1000)
+
+        return {
+            "rows": len(objects),
+            "cold_ms": round(statistics.median(timings["cold"]), 3),
+            "median_ms": round(statistics.median(timings["warm"]), 3),
+            "one_changed_ms": round(statistics.median(timings["one_changed"]), 3),
+            "speedup": round(statistics.median(timings["cold"]) / statistics.median(timings["warm"]), 2),
+            "identical": outputs["cold"] == outputs["warm"],
+        }
+
+    def measure_stock_contention(self, threads, writes_per_thread=200):
+        """
+        Souběžné odběry ze stejného řádku Material - ověří, že se neztratí žádná aktualizace.
+        """
+        material = Material.objects.create(
+            name="Benchmark", unit="ks", quantity=threads * writes_per_thread, price=1, price_per_unit=1
+        )
+        errors = []
+        succeeded = []
+
+        def worker():
+            done = 0
+            try:
+                for _ in range(writes_per_thread):
+                    Material.adjust_stock(material.pk, -1)
+                    done += 1
+            except Exception as error:
+                errors.append(repr(error))
+            finally:
+                succeeded.append(done)
+                connection.close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        material.refresh_from_db()
+        writes = sum(succeeded)
+        return {
+            "threads": threads,
+            "writes": writes,
+            "remaining_stock": material.quantity,
+            "lost_updates": threads * writes_per_thread - writes - material.quantity,
+            "errors": errors[:5],
+            "writes_per_second": round(writes / elapsed, 1),
+        }
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from construction_app.models import Photo
+from construction_app.photos import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        "Vytvoří chybějící náhledy fotografií (např. po restartu, kdy nedoběhlo zpracování na pozadí) "
+        "a zkusí znovu i fotografie, u kterých generování skončilo chybou"
+    )
+
+    def handle(self, *args, **options):
+        created = failed = 0
+        for photo in Photo.objects.filter(thumbnails_ready=False).iterator():
+            try:
+                generate_thumbnails(photo)
+                created += 1
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f"{photo.file.name}: {error!r}")
+        self.stdout.write(self.style.SUCCESS(f"Vytvořeno náhledů pro fotografií: {created}, chyb: {failed}"))
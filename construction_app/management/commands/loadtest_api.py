@@ -0,0 +1,91 @@
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from urllib.error import HTTPError, URLError
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand
+
+
+def timed_request(url):
+    started = time.perf_counter()
+    try:
+        with urlopen(url, timeout=30) as response:
+            response.read()
+            ok = response.status == 200
+    except (HTTPError, URLError, OSError):
+        ok = False
+    return ok, (time.perf_counter() - started) * 1000
+
+
+def run_client_process(url, threads, count):
+    """
+    Jeden proces generátoru zátěže - count požadavků z threads vláken. Vlákna jednoho procesu
+    sdílí GIL, proto se zátěž rozkládá do více procesů. Vrací dobu běhu bez startu procesu a výsledky.
+    """
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(timed_request, [url] * count))
+    return time.perf_counter() - started, results
+
+
+class Command(BaseCommand):
+    help = (
+        "Zátěžový test běžícího serveru - změří požadavky za sekundu a latence (p50/p99). "
+        "Spusťte proti WSGI (gunicorn) i ASGI (uvicorn) nasazení a výsledky porovnejte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("base_url", help="Adresa serveru, např. http://127.0.0.1:8000")
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="Testovaná cesta (lze opakovat), výchozí jsou sync i async API seznamy",
+        )
+        parser.add_argument("--concurrency", type=int, default=64, help="Počet souběžných klientů")
+        parser.add_argument(
+            "--processes", type=int, default=os.cpu_count(), help="Počet procesů generátoru (klienti se rozdělí mezi ně)"
+        )
+        parser.add_argument("--requests", type=int, default=5000, help="Počet požadavků na cestu")
+        parser.add_argument("--label", default="", help="Označení běhu ve výsledcích (např. wsgi/asgi)")
+        parser.add_argument("--output", help="Soubor, do kterého se připíše výsledek jako řádek JSON")
+
+    def handle(self, *args, **options):
+        paths = options["paths"] or [
+            "/api/projects/", "/api/async/projects/", "/api/materials/", "/api/async/materials/",
+        ]
+        for path in paths:
+            result = {"label": options["label"], "path": path, **self.run(
+                options["base_url"].rstrip("/") + path,
+                options["concurrency"], options["requests"], options["processes"],
+            )}
+            self.stdout.write(json.dumps(result))
+            if options["output"]:
+                with open(options["output"], "a", encoding="utf-8") as output:
+                    output.write(json.dumps(result) + "\n")
+
+    def run(self, url, concurrency, count, processes):
+        processes = max(1, min(processes, concurrency))
+        # klienti a požadavky rozdělené co nejrovnoměrněji mezi procesy
+        threads = [concurrency // processes + (number < concurrency % processes) for number in range(processes)]
+        counts = [count // processes + (number < count % processes) for number in range(processes)]
+
+        with ProcessPoolExecutor(max_workers=processes, mp_context=get_context("spawn")) as executor:
+            parts = list(executor.map(run_client_process, [url] * processes, threads, counts))
+        elapsed = max(part_elapsed for part_elapsed, _ in parts)
+        results = [result for _, part in parts for result in part]
+
+        latencies = sorted(latency for _, latency in results)
+        return {
+            "concurrency": concurrency,
+            "processes": processes,
+            "requests": count,
+            "errors": sum(1 for ok, _ in results if not ok),
+            "requests_per_second": round(count / elapsed, 1),
+            "p50_ms": round(statistics.median(latencies), 2),
+            "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 2),
+        }
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from construction_app.models import Project, ProjectDailySummary
+
+
+class Command(BaseCommand):
+    help = "Znovu sestaví denní souhrny projektů z denních záznamů a použitých materiálů"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--project",
+            action="append",
+            dest="projects",
+            metavar="SLUG",
+            help="Přepočítá jen zadaný projekt (lze opakovat)",
+        )
+
+    def handle(self, *args, **options):
+        project_ids = None
+        if options["projects"]:
+            project_ids = list(Project.objects.filter(slug__in=options["projects"]).values_list("pk", flat=True))
+
+        count = ProjectDailySummary.rebuild(project_ids)
+        self.stdout.write(self.style.SUCCESS(f"Sestaveno denních souhrnů: {count}"))
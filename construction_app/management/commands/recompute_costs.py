@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from construction_app.models import Material, Project
+
+
+class Command(BaseCommand):
+    help = (
+        "Přepočítá total_cost projektů a náklady denních souhrnů hromadnými UPDATE po dávkách projektů "
+        "(např. po hromadné změně cen materiálů)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Počet projektů v jednom UPDATE")
+        parser.add_argument(
+            "--material",
+            type=int,
+            action="append",
+            help="Jen projekty, které použily tento materiál (lze zadat vícekrát)",
+        )
+
+    def handle(self, *args, **options):
+        if options["material"]:
+            updated = Material.recompute_dependent_costs(options["material"])
+            self.stdout.write(self.style.SUCCESS(f"Přepočteno projektů: {updated}"))
+            return
+
+        batch_size = options["batch_size"]
+        projects = Project.objects.order_by("pk").values_list("pk", flat=True)
+        updated = 0
+        last_pk = 0
+        while True:
+            # každá dávka ve vlastní transakci, aby zámky nedržel celý přepočet
+            project_ids = list(projects.filter(pk__gt=last_pk)[:batch_size])
+            if not project_ids:
+                break
+            updated += Project.recompute_costs(project_ids)
+            last_pk = project_ids[-1]
+            self.stdout.write(f"Přepočteno projektů: {updated}")
+        self.stdout.write(self.style.SUCCESS(f"Hotovo, přepočteno projektů: {updated}"))
@@ -0,0 +1,40 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from construction_app.models import RecomputeJob
+
+logger = logging.getLogger("construction_app.jobs")
+
+
+class Command(BaseCommand):
+    help = "Zpracovává frontu přepočtů souhrnných hodnot projektů (RecomputeJob)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Zpracuje splatné úlohy a skončí")
+        parser.add_argument("--batch-size", type=int, default=50, help="Počet úloh převzatých najednou")
+        parser.add_argument("--sleep", type=float, default=2.0, help="Pauza v sekundách, když je fronta prázdná")
+
+    def handle(self, *args, **options):
+        processed = failed = 0
+        try:
+            while True:
+                close_old_connections()
+                jobs = RecomputeJob.claim(options["batch_size"])
+                for job in jobs:
+                    try:
+                        job.run()
+                        processed += 1
+                    except Exception:
+                        failed += 1
+                        logger.exception("Úloha %s selhala", job)
+                if options["once"] and not jobs:
+                    break
+                if not jobs:
+                    time.sleep(options["sleep"])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Zpracováno úloh: {processed}, neúspěšných: {failed}"))
+        self.stdout.write(f"Fronta: {RecomputeJob.stats()}")
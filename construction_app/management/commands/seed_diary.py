@@ -0,0 +1,120 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from construction_app.models import Project, Material, DailyLog, MaterialUsage, ProjectDailySummary, StockMovement
+from construction_app.search import update_search_vectors
+
+ACTIVITIES = [
+    "Betonáž stropu", "Zdění příček", "Výkop základů", "Bednění věnce", "Armování desky",
+    "Montáž lešení", "Izolace střechy", "Omítky interiér", "Pokládka dlažby", "Elektroinstalace",
+    "Rozvody vody", "Montáž oken", "Zateplení fasády", "Sádrokartony", "Úklid staveniště",
+]
+LOCATIONS = ["Praha", "Brno", "Ostrava", "Plzeň", "Liberec", "Olomouc", "Zlín", "Jihlava"]
+MATERIALS = [
+    ("Cihla", "ks"), ("Beton C25/30", "kg"), ("Cement", "kg"), ("Písek", "kg"), ("Výztuž", "m"),
+    ("KARI síť", "ks"), ("Sádrokarton", "ks"), ("Kabel CYKY", "m"), ("Trubka PPR", "m"), ("Hmoždinka", "ks"),
+]
+
+
+class Command(BaseCommand):
+    help = "Vygeneruje reprodukovatelná syntetická data deníku (projekty, materiály, denní záznamy)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--projects", type=int, default=10, help="Počet projektů")
+        parser.add_argument("--materials", type=int, default=50, help="Počet materiálů")
+        parser.add_argument("--logs", type=int, default=1000, help="Počet denních záznamů")
+        parser.add_argument("--usages-per-log", type=int, default=3, help="Počet použitých materiálů na záznam")
+        parser.add_argument("--seed", type=int, default=42, help="Semínko generátoru náhodných čísel")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Velikost dávky pro bulk_create")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+
+        with transaction.atomic():
+            projects = self.create_projects(rng, options["projects"])
+            materials = self.create_materials(rng, options["materials"])
+            self.create_logs(rng, projects, materials, options["logs"], options["usages_per_log"], batch_size)
+
+            # souhrnné hodnoty se dopočítají hromadně, bulk_create neprochází save()
+            Project.objects.filter(pk__in=[project.pk for project in projects]).update(
+                total_cost=Project.total_cost_subquery()
+            )
+            ProjectDailySummary.rebuild([project.pk for project in projects])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Vytvořeno projektů: {len(projects)}, materiálů: {len(materials)}, "
+            f"denních záznamů: {options['logs']}"
+        ))
+
+    def create_projects(self, rng, count):
+        offset = Project.objects.count()
+        today = timezone.localdate()
+        projects = []
+        for number in range(offset, offset + count):
+            name = f"Projekt {number + 1:05d}"
+            start_date = today - timedelta(days=rng.randint(30, 3 * 365))
+            projects.append(Project(
+                name=name,
+                slug=slugify(name),
+                location=rng.choice(LOCATIONS),
+                start_date=start_date,
+                status=rng.choice(Project.STATUS_CHOICES)[0],
+            ))
+        return Project.objects.bulk_create(projects)
+
+    def create_materials(self, rng, count):
+        materials = []
+        for number in range(count):
+            name, unit = MATERIALS[number % len(MATERIALS)]
+            quantity = rng.randint(10_000, 1_000_000)
+            price = Decimal(rng.randint(100, 100_000_000)) / 100
+            materials.append(Material(
+                name=f"{name} {number + 1}",
+                unit=unit,
+                quantity=quantity,
+                price=price,
+                price_per_unit=(price / quantity).quantize(Decimal("0.01")) or Decimal("0.01"),
+            ))
+        materials = Material.objects.bulk_create(materials)
+        # bulk_create neprochází save(), počáteční stav se do evidence zapíše jako příjem
+        StockMovement.objects.bulk_create([
+            StockMovement(material=material, kind="receipt", quantity=material.quantity)
+            for material in materials
+        ])
+        return materials
+
+    def create_logs(self, rng, projects, materials, count, usages_per_log, batch_size):
+        today = timezone.localdate()
+        for start in range(0, count, batch_size):
+            daily_logs = []
+            for _ in range(min(batch_size, count - start)):
+                project = rng.choice(projects)
+                span = max((today - project.start_date).days, 1)
+                daily_logs.append(DailyLog(
+                    project=project,
+                    title=rng.choice(ACTIVITIES),
+                    description=f"{rng.choice(ACTIVITIES)}, {rng.randint(1, 12)} pracovníků",
+                    date=project.start_date + timedelta(days=rng.randrange(span)),
+                    work_time=timedelta(minutes=rng.randrange(60, 10 * 60, 15)),
+                    temperature=Decimal(rng.randint(-150, 350)) / 10 if rng.random() > 0.1 else None,
+                ))
+            daily_logs = DailyLog.objects.bulk_create(daily_logs)
+            update_search_vectors(DailyLog.objects.filter(pk__in=[daily_log.pk for daily_log in daily_logs]))
+
+            usages = [
+                MaterialUsage(
+                    daily_log=daily_log,
+                    material=material,
+                    used_quantity=rng.randint(1, 50),
+                )
+                for daily_log in daily_logs
+                for material in rng.sample(materials, min(usages_per_log, len(materials)))
+            ]
+            MaterialUsage.objects.bulk_create(usages, batch_size=batch_size)
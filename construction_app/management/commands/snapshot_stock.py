@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from construction_app.models import StockMovement, StockSnapshot
+
+# odstup snímku od aktuálního času, aby do něj nespadly pohyby z ještě neukončených transakcí
+STOCK_SNAPSHOT_DELAY = getattr(settings, "STOCK_SNAPSHOT_DELAY", timedelta(minutes=5))
+
+
+class Command(BaseCommand):
+    help = (
+        "Vytvoří snímek stavu skladu ze skladové evidence (spouštět periodicky, např. z cronu). "
+        "Dotazy na stav k datu pak čtou jen pohyby od posledního snímku."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reconcile",
+            action="store_true",
+            help="Rozdíly mezi evidencí a Material.quantity nejdřív vyrovná korekčními pohyby",
+        )
+
+    def handle(self, *args, **options):
+        if options["reconcile"]:
+            self.reconcile()
+
+        taken_at = timezone.now() - STOCK_SNAPSHOT_DELAY
+        with transaction.atomic():
+            created = StockSnapshot.take(taken_at)
+        self.stdout.write(self.style.SUCCESS(f"Snímků vytvořeno: {created} (k {taken_at:%Y-%m-%d %H:%M:%S})"))
+
+    def reconcile(self):
+        """
+        Doplní korekce pro materiály, jejichž stav podle evidence neodpovídá Material.quantity
+        (např. data vložená hromadně mimo save()).
+        """
+        with transaction.atomic():
+            drifted = (
+                StockSnapshot.ledger_quantities(timezone.now())
+                .select_for_update(of=("self",))
+                .exclude(quantity=F("ledger_quantity"))
+                .values_list("pk", "name", "quantity", "ledger_quantity")
+            )
+            corrections = []
+            for pk, name, quantity, ledger_quantity in drifted:
+                self.stdout.write(f"{name}: sklad {quantity}, evidence {ledger_quantity}")
+                corrections.append(StockMovement(material_id=pk, kind="correction", quantity=quantity - ledger_quantity))
+            StockMovement.objects.bulk_create(corrections)
+        self.stdout.write(f"Korekčních pohybů: {len(corrections)}")
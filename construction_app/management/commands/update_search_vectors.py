@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from construction_app.models import ArchivedDailyLog, DailyLog
+from construction_app.search import full_text_available, update_search_vectors
+
+
+class Command(BaseCommand):
+    help = (
+        "Přepočítá uložené search_vector denních záznamů včetně archivovaných "
+        "(po nasazení nebo změně konfigurace hledání)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000, help="Počet záznamů v jednom UPDATE")
+
+    def handle(self, *args, **options):
+        if not full_text_available(DailyLog.objects.all()):
+            self.stdout.write(self.style.WARNING("Fulltext je dostupný jen na PostgreSQL"))
+            return
+
+        for model in (DailyLog, ArchivedDailyLog):
+            updated = self.update_model(model, options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"{model._meta.verbose_name_plural}: přepočteno záznamů {updated}"))
+
+    def update_model(self, model, batch_size):
+        queryset = model.objects.order_by("pk")
+        updated = 0
+        last_pk = 0
+        while True:
+            # po rozsazích primárního klíče, aby jeden UPDATE nedržel zámky nad celou tabulkou
+            pks = list(queryset.filter(pk__gt=last_pk).values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                break
+            with transaction.atomic():
+                updated += update_search_vectors(model.objects.filter(pk__gte=pks[0], pk__lte=pks[-1]))
+            last_pk = pks[-1]
+        return updated
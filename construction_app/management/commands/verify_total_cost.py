@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from construction_app import caching
+from construction_app.models import Project, RecomputeJob
+
+
+class Command(BaseCommand):
+    help = "Porovná průběžně udržované Project.total_cost s úplným přepočtem a vypíše odchylky"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Odchylné hodnoty přepíše výsledkem úplného přepočtu",
+        )
+        parser.add_argument(
+            "--enqueue",
+            action="store_true",
+            help="Odchylné projekty jen zařadí do fronty přepočtů (zpracuje run_recompute_worker)",
+        )
+
+    def handle(self, *args, **options):
+        projects = (
+            Project.objects
+            .annotate(recomputed=Project.total_cost_subquery())
+            .values_list("pk", "name", "total_cost", "recomputed")
+            .order_by("pk")
+        )
+
+        drifted = []
+        for pk, name, total_cost, recomputed in projects.iterator():
+            if (total_cost or 0) != recomputed:
+                drifted.append(pk)
+                self.stdout.write(
+                    f"{name}: uloženo {total_cost or 0}, přepočet {recomputed}, "
+                    f"odchylka {(total_cost or 0) - recomputed}"
+                )
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Všechny projekty odpovídají úplnému přepočtu"))
+            return
+
+        if options["enqueue"]:
+            RecomputeJob.schedule("project_cost", drifted, delay=timedelta(0))
+            self.stdout.write(self.style.SUCCESS(f"Zařazeno do fronty: {len(drifted)}"))
+        elif options["fix"]:
+            Project.objects.filter(pk__in=drifted).update(total_cost=Project.total_cost_subquery())
+            # UPDATE neposílá signály - uložené API odpovědi a řádky seznamu projektů se zneplatní zvlášť
+            caching.invalidate_many("project", drifted)
+            self.stdout.write(self.style.SUCCESS(f"Opraveno projektů: {len(drifted)}"))
+        else:
+            self.stdout.write(self.style.WARNING(f"Projektů s odchylkou: {len(drifted)}"))
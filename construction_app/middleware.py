@@ -0,0 +1,110 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger("construction_app.sql")
+
+# nastavení v settings.SQL_INSTRUMENTATION, např. {"ENABLED": True, "SLOW_REQUEST_MS": 500}
+DEFAULTS = {
+    "ENABLED": False,
+    "SLOW_REQUEST_MS": 500,
+    "SLOWEST_QUERIES": 5,
+}
+
+
+class QueryRecorder:
+    """
+    Wrapper pro connection.execute_wrapper - měří každý SQL dotaz (funguje i bez DEBUG).
+    """
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, (time.perf_counter() - started) * 1000))
+
+    @property
+    def total_ms(self):
+        return sum(duration for _, duration in self.queries)
+
+    def slowest(self, count):
+        return sorted(self.queries, key=lambda query: query[1], reverse=True)[:count]
+
+    def duplicates(self):
+        """
+        Skupiny stejných dotazů (bez parametrů) spuštěných víckrát - typicky N+1.
+        """
+        counts = Counter(sql for sql, _ in self.queries)
+        return [(sql, count) for sql, count in counts.most_common() if count > 1]
+
+
+class SqlReportFormatter(logging.Formatter):
+    """
+    Formátuje záznamy pomalých požadavků jako jeden řádek JSON.
+    """
+    def format(self, record):
+        report = getattr(record, "sql_report", None)
+        if report is None:
+            return super().format(record)
+        return json.dumps({"message": record.getMessage(), **report}, ensure_ascii=False)
+
+
+class SqlInstrumentationMiddleware:
+    """
+    Změří SQL dotazy každého požadavku, pošle je v hlavičce Server-Timing a pomalé
+    požadavky zapíše do logu construction_app.sql.
+    """
+    def __init__(self, get_response):
+        self.config = {**DEFAULTS, **getattr(settings, "SQL_INSTRUMENTATION", {})}
+        if not self.config["ENABLED"]:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - started) * 1000
+
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={recorder.total_ms:.1f};desc="{len(recorder.queries)} queries"',
+            f"app;dur={total_ms:.1f}",
+        ])
+        if total_ms >= self.config["SLOW_REQUEST_MS"]:
+            self.log_slow_request(request, response, recorder, total_ms)
+        return response
+
+    def log_slow_request(self, request, response, recorder, total_ms):
+        logger.warning(
+            "Pomalý požadavek %s %s (%.1f ms, %d dotazů)",
+            request.method, request.path, total_ms, len(recorder.queries),
+            extra={
+                "sql_report": {
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "duration_ms": round(total_ms, 1),
+                    "db_ms": round(recorder.total_ms, 1),
+                    "query_count": len(recorder.queries),
+                    "slowest": [
+                        {"sql": sql, "duration_ms": round(duration, 1)}
+                        for sql, duration in recorder.slowest(self.config["SLOWEST_QUERIES"])
+                    ],
+                    "duplicates": [
+                        {"sql": sql, "count": count} for sql, count in recorder.duplicates()
+                    ],
+                },
+            },
+        )
@@ -1,14 +1,24 @@
-from django.db import models
-from django.db.models import Sum, F
-from datetime import timedelta
+from collections import defaultdict
+
+from django.db import connections, models, transaction, IntegrityError
+from django.db.models import Sum, F, Q, Min, Exists, OuterRef, Subquery, Value, Case, When, Prefetch
+from django.contrib.postgres.indexes import OpClass
+from django.db.models.functions import Coalesce, Upper
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from django.utils.text import slugify
 
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from . import caching
+from .search import PrefixSearchIndex, SearchVectorIndex, update_search_vectors
+
 
 class Project(models.Model):
     STATUS_CHOICES = [
@@ -22,12 +32,18 @@ class Project(models.Model):
     start_date = models.DateField(default= timezone.now, verbose_name="Začátek projektu")
     end_date = models.DateField(null=True, blank=True, verbose_name="Konec projektu")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="planned", verbose_name="Stav")
-    total_cost = models.DecimalField(null=True, blank=True, max_digits=20, decimal_places=2, default=0)
+    # udržuje se jen F() přírůstky a přepočty (apply_cost_delta, recompute_costs), save() ho nezapisuje
+    total_cost = models.DecimalField(null=True, blank=True, max_digits=20, decimal_places=2, default=0, editable=False)
     slug = models.SlugField(max_length=100)
     
     class Meta:
         verbose_name_plural = "Projekty"
         verbose_name = "Projekt"
+        indexes = [
+            models.Index(fields=["status"]),
+            # našeptávač projektů v adminu (search_fields "^name")
+            PrefixSearchIndex(OpClass(Upper("name"), name="text_pattern_ops"), name="project_name_prefix_idx"),
+        ]
         
     def __str__(self):
         return self.name
@@ -35,26 +51,104 @@ class Project(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        if not self._state.adding and kwargs.get("update_fields") is None:
+            # zastaralá instance nesmí přepsat total_cost změněné mezitím přírůstky nebo přepočtem
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "total_cost"
+            ]
+        with transaction.atomic():
+            previous_status = None
+            if self.pk:
+                previous_status = Project.objects.filter(pk=self.pk).values_list("status", flat=True).first()
+            super().save(*args, **kwargs)
+            if kwargs.get("update_fields") is not None and "total_cost" not in kwargs["update_fields"]:
+                # aktuální hodnota pro volajícího (odpověď API, přesměrování formuláře)
+                self.refresh_from_db(fields=["total_cost"])
+
+            if previous_status == "completed" and self.status != "completed":
+                # znovu otevřený projekt - archivované záznamy se vrátí na pozadí
+                RecomputeJob.schedule("restore_archive", [self.pk], delay=timedelta(0))
+
+    def compute_total_cost(self):
+        """
+        Spočítá celkové náklady projektu úplným přepočtem všech použitých materiálů
+        """
+        return sum(
+            logs.aggregate(
+                total=Sum(F("daily_usages__used_quantity") * F("daily_usages__material__price_per_unit"))
+            )["total"] or 0
+            for logs in (self.daily_logs, self.archived_daily_logs)
+        )
 
     def update_total_cost(self):
         """
         Aktualizuje celkové náklady projektu na základě použitých materiálů v denních záznamech
         """
-        self.total_cost = (
-                self.daily_logs.aggregate(
-                    total=Sum(
-                        F("daily_usages__used_quantity") * F("daily_usages__material__price_per_unit")
-                    )
-                )["total"] or 0
+        self.total_cost = self.compute_total_cost()
+        self.save(update_fields=["total_cost"])
+
+    @staticmethod
+    def total_cost_subquery():
+        """
+        Korelovaný poddotaz s úplným přepočtem nákladů (včetně archivu) pro projekt z vnějšího dotazu (OuterRef("pk"))
+        """
+        def costs(usage_model):
+            return Coalesce(
+                Subquery(
+                    usage_model.objects
+                    .filter(daily_log__project=OuterRef("pk"))
+                    .values("daily_log__project")
+                    .annotate(total=Sum(F("used_quantity") * F("material__price_per_unit")))
+                    .values("total")
+                ),
+                Value(Decimal(0)),
+                output_field=models.DecimalField(),
+            )
+        # archivované řádky se počítají také
+        return costs(MaterialUsage) + costs(ArchivedMaterialUsage)
+
+    @staticmethod
+    def apply_cost_delta(project_id, delta):
+        """
+        Přičte rozdíl nákladů k total_cost jedním atomickým UPDATE, bez přepočtu celé historie projektu
+        """
+        if project_id is None or not delta:
+            return
+        Project.objects.filter(pk=project_id).update(
+            total_cost=Coalesce(F("total_cost"), Value(Decimal(0)), output_field=models.DecimalField()) + delta
         )
-        self.save()
+        caching.invalidate("project", project_id)
+
+    @staticmethod
+    def recompute_costs(project_ids, material_ids=None):
+        """
+        Přepočítá total_cost projektů jedním UPDATE s korelovaným poddotazem a material_cost jejich
+        denních souhrnů dalším (při material_ids jen dnů, kdy se tyto materiály použily).
+        """
+        if not project_ids:
+            return 0
+        summaries = ProjectDailySummary.objects.filter(project_id__in=project_ids)
+        if material_ids is not None:
+            used = Q()
+            for usage_model in (MaterialUsage, ArchivedMaterialUsage):
+                used |= Q(Exists(usage_model.objects.filter(
+                    material__in=material_ids,
+                    daily_log__project=OuterRef("project"),
+                    daily_log__date=OuterRef("date"),
+                )))
+            summaries = summaries.filter(used)
+        with transaction.atomic():
+            updated = Project.objects.filter(pk__in=project_ids).update(total_cost=Project.total_cost_subquery())
+            summaries.update(material_cost=ProjectDailySummary.material_cost_subquery())
+        caching.invalidate_many("project", project_ids)
+        return updated
 
     def total_work_time(self):
         """
-        Spočítá celkový čas práce ze všech denních záznamů
+        Spočítá celkový čas práce ze všech denních záznamů (z denních souhrnů projektu)
         """
-        total_time = self.daily_logs.aggregate(total=Sum("work_time"))["total"]
+        total_time = self.daily_summaries.aggregate(total=Sum("work_time"))["total"]
         return total_time or timedelta(0)
 
 
@@ -74,31 +168,371 @@ class Material(models.Model):
     class Meta:
         verbose_name_plural = "Materiály"
         verbose_name = "Materiál"
+        indexes = [
+            # našeptávač materiálů v adminu (search_fields "^name")
+            PrefixSearchIndex(OpClass(Upper("name"), name="text_pattern_ops"), name="material_name_prefix_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.quantity} {self.unit}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # množství při načtení - save() podle něj pozná, zda ho volající změnil
+        instance._loaded_quantity = instance.__dict__.get("quantity")
+        return instance
+
     def save(self, *args, **kwargs):
+        """
+        Uloží materiál a změnu množství zapíše do skladové evidence (příjem nebo korekce).
+        Při změně ceny za jednotku přepočítá náklady všech projektů, které materiál použily.
+        Nezměněné množství se neukládá - zastaralá instance nesmí vrátit souběžné odběry.
+        """
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                # zámek řádku - korekce se počítá z aktuálního množství, ne z načteného
+                previous = (
+                    Material.objects.select_for_update().filter(pk=self.pk)
+                    .values_list("quantity", "price", "price_per_unit", named=True)
+                    .first()
+                )
+            if previous:
+                self.apply_price_change(previous.price, previous.price_per_unit)
+                update_fields = kwargs.get("update_fields")
+                if update_fields is None and self.quantity == getattr(self, "_loaded_quantity", None):
+                    kwargs["update_fields"] = update_fields = [
+                        field.name for field in self._meta.concrete_fields
+                        if not field.primary_key and field.name != "quantity"
+                    ]
+                if update_fields is not None and "quantity" not in update_fields:
+                    self.quantity = previous.quantity
+            self.fill_price_per_unit()
+            super().save(*args, **kwargs)
+            self._loaded_quantity = self.quantity
+
+            delta = self.quantity - (previous.quantity if previous else 0)
+            if delta:
+                kind = "receipt" if previous is None else "correction"
+                StockMovement.objects.create(material=self, kind=kind, quantity=delta)
+            if previous and previous.price_per_unit != self.price_per_unit:
+                Material.recompute_dependent_costs([self.pk])
+
+    def fill_price_per_unit(self):
         if not self.price_per_unit and self.quantity > 0:
             self.price_per_unit = self.price / self.quantity
-        super().save(*args, **kwargs)
+
+    def apply_price_change(self, previous_price, previous_price_per_unit):
+        """
+        Při změně celkové ceny (a nezměněné ceně za jednotku) přepočítá cenu za jednotku ve stejném
+        poměru - původně nakoupené množství price / price_per_unit zůstává.
+        """
+        if (
+            self.price != previous_price
+            and self.price_per_unit == previous_price_per_unit
+            and previous_price
+            and previous_price_per_unit
+        ):
+            self.price_per_unit = (previous_price_per_unit * self.price / previous_price).quantize(Decimal("0.01"))
+
+    @staticmethod
+    def recompute_dependent_costs(material_ids):
+        """
+        Přepočítá náklady projektů a denních souhrnů, které dané materiály použily.
+        """
+        project_ids = set()
+        for log_model in (DailyLog, ArchivedDailyLog):
+            project_ids.update(
+                log_model.objects
+                .filter(daily_usages__material__in=material_ids, project__isnull=False)
+                .values_list("project_id", flat=True)
+                .distinct()
+            )
+        return Project.recompute_costs(sorted(project_ids), material_ids)
+
+    @staticmethod
+    def bulk_create_materials(materials):
+        """
+        Vytvoří materiály hromadně (bez save()) a počáteční množství zapíše do evidence jako příjem.
+        """
+        for material in materials:
+            material.fill_price_per_unit()
+        with transaction.atomic():
+            materials = Material.objects.bulk_create(materials)
+            StockMovement.objects.bulk_create([
+                StockMovement(material=material, kind="receipt", quantity=material.quantity)
+                for material in materials
+                if material.quantity
+            ])
+        caching.invalidate_many("material", [material.pk for material in materials])
+        return materials
+
+    @staticmethod
+    def bulk_update_materials(materials, fields, previous):
+        """
+        Uloží změněné materiály jedním bulk_update. Změny množství oproti previous ({pk: Material
+        před úpravou}) zapíše do evidence jako korekce a při změně ceny za jednotku přepočítá
+        náklady dotčených projektů. Řádky mají být zamčené select_for_update.
+        """
+        for material in materials:
+            material.apply_price_change(previous[material.pk].price, previous[material.pk].price_per_unit)
+            material.fill_price_per_unit()
+        fields = set(fields) | {"price_per_unit"}
+        with transaction.atomic():
+            Material.objects.bulk_update(materials, sorted(fields))
+            StockMovement.objects.bulk_create([
+                StockMovement(
+                    material=material,
+                    kind="correction",
+                    quantity=material.quantity - previous[material.pk].quantity,
+                )
+                for material in materials
+                if material.quantity != previous[material.pk].quantity
+            ])
+            repriced = [
+                material.pk for material in materials
+                if material.price_per_unit != previous[material.pk].price_per_unit
+            ]
+            if repriced:
+                Material.recompute_dependent_costs(repriced)
+        caching.invalidate_many("material", [material.pk for material in materials])
+        return materials
+
+    def stock_at(self, when=None):
+        """
+        Množství na skladě k danému okamžiku: poslední snímek před ním + pohyby od snímku.
+        """
+        return StockMovement.stock_at(self.pk, when or timezone.now())
+
+    @staticmethod
+    def adjust_stock(material_id, delta, kind=None):
+        """
+        Atomicky změní skladové množství o delta jedním UPDATE s F() výrazem a zapíše pohyb do evidence.
+        Odběr (záporná delta) proběhne jen při dostatečném množství (UPDATE ... WHERE quantity >= n),
+        takže souběžné zápisy nemohou ztratit aktualizaci ani dostat sklad do záporu.
+        """
+        if not delta:
+            return
+        materials = Material.objects.filter(pk=material_id)
+        if delta < 0:
+            materials = materials.filter(quantity__gte=-delta)
+        with transaction.atomic():
+            if not materials.update(quantity=F("quantity") + delta):
+                raise ValidationError("Nedostatečné množství materiálu")
+            StockMovement.objects.create(
+                material_id=material_id,
+                kind=kind or ("usage" if delta < 0 else "return"),
+                quantity=delta,
+            )
+        caching.invalidate("material", material_id)
+
+    @staticmethod
+    def withdraw_stock_bulk(demand):
+        """
+        Odebere množství pro více materiálů jedním podmíněným UPDATE ({material_id: množství}).
+        Pokud některý materiál nemá dostatek, celá změna se vrátí a vyvolá se ValidationError.
+        """
+        if not demand:
+            return
+        needed = Case(
+            *[When(pk=material_id, then=Value(quantity)) for material_id, quantity in demand.items()],
+            output_field=models.IntegerField(),
+        )
+        with transaction.atomic():
+            updated = (
+                Material.objects
+                .filter(pk__in=demand.keys(), quantity__gte=needed)
+                .update(quantity=F("quantity") - needed)
+            )
+            if updated != len(demand):
+                raise ValidationError("Nedostatečné množství materiálu")
+            StockMovement.objects.bulk_create([
+                StockMovement(material_id=material_id, kind="usage", quantity=-quantity)
+                for material_id, quantity in demand.items()
+            ])
+        caching.invalidate_many("material", demand.keys())
+
+
+class StockMovement(models.Model):
+    """
+    Neměnný záznam pohybu na skladě - evidence se pouze doplňuje, nikdy nepřepisuje.
+    """
+    KIND_CHOICES = [
+        ("receipt", "Příjem"),
+        ("usage", "Výdej"),
+        ("return", "Vrácení"),
+        ("correction", "Korekce"),
+    ]
+
+    material = models.ForeignKey(Material, related_name="stock_movements", on_delete=models.CASCADE, verbose_name="Materiál")
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Druh")
+    quantity = models.IntegerField(verbose_name="Množství")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Čas")
+
+    class Meta:
+        verbose_name_plural = "Skladové pohyby"
+        verbose_name = "Skladový pohyb"
+        indexes = [
+            models.Index(fields=["material", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.created_at} - {self.get_kind_display()} {self.quantity}"
+
+    @staticmethod
+    def stock_at(material_id, when):
+        """
+        Stav skladu k okamžiku when. Čte se jen poslední snímek a pohyby po něm, takže doba
+        dotazu závisí na intervalu snímků, ne na délce celé historie.
+        """
+        snapshot = (
+            StockSnapshot.objects
+            .filter(material_id=material_id, taken_at__lte=when)
+            .order_by("-taken_at")
+            .first()
+        )
+        movements = StockMovement.objects.filter(material_id=material_id, created_at__lte=when)
+        base = 0
+        if snapshot:
+            movements = movements.filter(created_at__gt=snapshot.taken_at)
+            base = snapshot.quantity
+        return base + (movements.aggregate(total=Sum("quantity"))["total"] or 0)
+
+
+class StockSnapshot(models.Model):
+    """
+    Periodický snímek stavu skladu - zahrnuje všechny pohyby do taken_at včetně.
+    """
+    material = models.ForeignKey(Material, related_name="stock_snapshots", on_delete=models.CASCADE, verbose_name="Materiál")
+    taken_at = models.DateTimeField(verbose_name="Čas snímku")
+    quantity = models.IntegerField(verbose_name="Množství")
+
+    class Meta:
+        verbose_name_plural = "Snímky skladu"
+        verbose_name = "Snímek skladu"
+        constraints = [
+            models.UniqueConstraint(fields=["material", "taken_at"], name="unique_stock_snapshot"),
+        ]
+
+    def __str__(self):
+        return f"{self.taken_at} - {self.quantity}"
+
+    @staticmethod
+    def ledger_quantities(when):
+        """
+        Materiály anotované stavem skladu podle evidence k okamžiku when (ledger_quantity),
+        spočteným jedním dotazem z posledních snímků a pohybů po nich.
+        """
+        snapshots = (
+            StockSnapshot.objects
+            .filter(material=OuterRef("pk"), taken_at__lte=when)
+            .order_by("-taken_at")
+        )
+        movements = (
+            StockMovement.objects
+            .filter(
+                material=OuterRef("pk"),
+                created_at__gt=OuterRef("snapshot_taken_at"),
+                created_at__lte=when,
+            )
+            .values("material")
+            .annotate(total=Sum("quantity"))
+            .values("total")
+        )
+        return Material.objects.annotate(
+            snapshot_taken_at=Coalesce(
+                Subquery(snapshots.values("taken_at")[:1]),
+                Value(datetime.min.replace(tzinfo=dt_timezone.utc)),
+            ),
+            ledger_quantity=(
+                Coalesce(Subquery(snapshots.values("quantity")[:1]), Value(0))
+                + Coalesce(Subquery(movements), Value(0))
+            ),
+        )
+
+    @staticmethod
+    def take(taken_at):
+        """
+        Vytvoří snímek všech materiálů s pohyby od posledního snímku a vrátí jejich počet.
+        """
+        materials = (
+            StockSnapshot.ledger_quantities(taken_at)
+            .filter(stock_movements__created_at__lte=taken_at)
+            .filter(stock_movements__created_at__gt=F("snapshot_taken_at"))
+            .distinct()
+            .values_list("pk", "ledger_quantity")
+        )
+        snapshots = StockSnapshot.objects.bulk_create([
+            StockSnapshot(material_id=material_id, taken_at=taken_at, quantity=quantity)
+            for material_id, quantity in materials.iterator()
+        ])
+        return len(snapshots)
 
 
 class DailyLog(models.Model):
+    is_archived = False
+
     project = models.ForeignKey(Project, related_name="daily_logs", on_delete=models.PROTECT, null=True, verbose_name="Projekt")
     title = models.CharField(max_length=150, null=True, verbose_name="Název")
     description = models.TextField(null=True, blank=True, verbose_name="Popis činnosti")
     date = models.DateField(verbose_name="Datum")
     work_time = models.DurationField(verbose_name="Doba práce")
     temperature = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True, verbose_name="Teplota")
+    # uložený tsvector názvu a popisu pro fulltext, udržuje ho save() a update_search_vectors()
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         verbose_name_plural = "Denní zápisy"
         verbose_name = "Denní zápis"
+        indexes = [
+            # filtrování projektu v rozsahu dat a stránkování podle (date, pk)
+            models.Index(fields=["project", "date"]),
+            models.Index(fields=["date", "id"]),
+            SearchVectorIndex(fields=["search_vector"], name="dailylog_search_vector_idx"),
+        ]
 
     def __str__(self):
         return f"{self.date} - {self.project.name}"
 
+    @staticmethod
+    def with_usages(queryset=None):
+        """
+        Denní záznamy s projektem a řádky materiálu včetně materiálu - dva dotazy bez ohledu na počet řádků
+        """
+        if queryset is None:
+            queryset = DailyLog.objects.all()
+        return queryset.select_related("project").prefetch_related(
+            Prefetch("daily_usages", queryset=MaterialUsage.objects.select_related("material"))
+        )
+
+    def save(self, *args, **kwargs):
+        """
+        Uloží záznam a promítne změnu do denního souhrnu projektu. Při změně projektu nebo data
+        se náklady řádků materiálu přesunou do nového souhrnu (a projektu).
+        """
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = DailyLog.objects.filter(pk=self.pk).first()
+            super().save(*args, **kwargs)
+            if not previous or (previous.title, previous.description) != (self.title, self.description):
+                update_search_vectors(DailyLog.objects.filter(pk=self.pk))
+
+            if previous:
+                ProjectDailySummary.apply_log(previous, -1)
+            ProjectDailySummary.apply_log(self, 1)
+
+            if previous and (previous.project_id, previous.date) != (self.project_id, self.date):
+                usages = self.daily_usages.aggregate(
+                    cost=Sum(F("used_quantity") * F("material__price_per_unit")),
+                    count=models.Count("pk"),
+                )
+                if usages["count"]:
+                    cost = usages["cost"] or 0
+                    MaterialUsage.apply_totals(previous, -cost, -usages["count"])
+                    MaterialUsage.apply_totals(self, cost, usages["count"])
+
 
 class MaterialUsage(models.Model):
     daily_log = models.ForeignKey(DailyLog, related_name="daily_usages", on_delete=models.CASCADE)
@@ -108,39 +542,656 @@ class MaterialUsage(models.Model):
     class Meta:
         verbose_name_plural = "Použité materiály"
         verbose_name = "Použitý materiál"
+        indexes = [
+            models.Index(fields=["material", "daily_log"]),
+        ]
 
     def __str__(self):
         return f"{self.daily_log.date} - {self.material.name}"
 
+    def cost(self):
+        """
+        Náklady na tento řádek (used_quantity * price_per_unit)
+        """
+        return self.used_quantity * (self.material.price_per_unit or 0)
+
     def clean(self):
-        if self.used_quantity > self.material.quantity:
+        # neplatný materiál nebo množství už ohlásila pole formuláře
+        if None not in (self.material_id, self.used_quantity) and self.used_quantity > self.material.quantity:
             raise ValidationError("Nedostatečné množství materiálu")
 
     def save(self, *args, **kwargs):
         """
-        Odebere požadované množství z Material.quantity a přepočítá celkové náklady projektu.
+        Odebere požadované množství z Material.quantity a připočte rozdíl nákladů k projektu.
         """
         # Zavolání validace
         self.full_clean()
 
-        self.material.quantity -= self.used_quantity
-        self.material.save()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            # původní verze řádku, aby se do skladu a projektu promítl jen rozdíl
+            previous = None
+            if self.pk:
+                previous = MaterialUsage.objects.select_related("material", "daily_log").filter(pk=self.pk).first()
+
+            if previous and previous.material_id == self.material_id:
+                stock_delta = previous.used_quantity - self.used_quantity
+            else:
+                stock_delta = -self.used_quantity
+                if previous:
+                    Material.adjust_stock(previous.material_id, previous.used_quantity, kind="return")
+
+            Material.adjust_stock(self.material_id, stock_delta)
+            self.material.quantity += stock_delta
+            super().save(*args, **kwargs)
+
+            #  přírůstková aktualizace celkových nákladů a denního souhrnu
+            if previous and previous.daily_log_id == self.daily_log_id:
+                MaterialUsage.apply_totals(self.daily_log, self.cost() - previous.cost(), 0)
+            else:
+                if previous:
+                    MaterialUsage.apply_totals(previous.daily_log, -previous.cost(), -1)
+                MaterialUsage.apply_totals(self.daily_log, self.cost(), 1)
+
+    @staticmethod
+    def apply_totals(daily_log, cost, count):
+        """
+        Připočte náklady a počet řádků k Project.total_cost a k denním souhrnu záznamu.
+        """
+        Project.apply_cost_delta(daily_log.project_id, cost)
+        ProjectDailySummary.apply_delta(daily_log.project_id, daily_log.date, material_cost=cost, usage_count=count)
+
+    @classmethod
+    def bulk_create_for_log(cls, daily_log, usages):
+        """
+        Hromadně uloží řádky jednoho denního záznamu v jedné transakci: jeden podmíněný UPDATE skladu,
+        jeden bulk_create a jedna aktualizace nákladů projektu a souhrnu bez ohledu na počet řádků.
+        """
+        demand = defaultdict(int)
+        cost = 0
+        for usage in usages:
+            usage.daily_log = daily_log
+            demand[usage.material_id] += usage.used_quantity
+            cost += usage.cost()
+
+        with transaction.atomic():
+            Material.withdraw_stock_bulk(demand)
+            cls.objects.bulk_create(usages)
+            cls.apply_totals(daily_log, cost, len(usages))
+        return usages
+
+
+class Photo(models.Model):
+    """
+    Soubor fotografie uložený pod SHA-256 obsahu - stejný obsah je na disku jen jednou.
+    """
+    THUMBNAIL_SIZES = {
+        "thumb": (200, 200),
+        "preview": (1024, 1024),
+    }
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(max_length=255, verbose_name="Soubor")
+    size = models.PositiveBigIntegerField(verbose_name="Velikost")
+    content_type = models.CharField(max_length=100, blank=True)
+    thumbnails_ready = models.BooleanField(default=False, verbose_name="Náhledy vytvořeny")
+    # poslední chyba generování náhledů, prázdná = zatím bez chyby
+    thumbnail_error = models.TextField(blank=True, verbose_name="Chyba náhledů")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "Fotografie"
+        verbose_name = "Fotografie"
+
+    def __str__(self):
+        return self.sha256
+
+    @staticmethod
+    def original_path(sha256, extension):
+        return f"photos/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+    def thumbnail_path(self, size_name):
+        return f"photos/{size_name}/{self.sha256[:2]}/{self.sha256}.jpg"
+
+    def thumbnail_url(self):
+        return f"{settings.MEDIA_URL}{self.thumbnail_path('thumb')}"
+
+    def preview_url(self):
+        return f"{settings.MEDIA_URL}{self.thumbnail_path('preview')}"
+
+    @staticmethod
+    def mark_thumbnails_ready(photo_pk):
+        """
+        Označí náhledy fotografie jako hotové a zneplatní řádky denních záznamů, které ji zobrazují.
+        """
+        with transaction.atomic():
+            Photo.objects.filter(pk=photo_pk).update(thumbnails_ready=True, thumbnail_error="")
+            caching.invalidate_many(
+                "dailylog", DailyLogPhoto.objects.filter(photo=photo_pk).values_list("daily_log_id", flat=True)
+            )
+
+    @staticmethod
+    def mark_thumbnails_failed(photo_pk, error):
+        """
+        Zaznamená chybu generování náhledů - fotografie zůstane bez náhledů, dokud je znovu
+        nevytvoří příkaz generate_thumbnails.
+        """
+        Photo.objects.filter(pk=photo_pk).update(thumbnail_error=repr(error))
+
+
+class DailyLogPhoto(models.Model):
+    daily_log = models.ForeignKey(DailyLog, related_name="photos", on_delete=models.CASCADE, verbose_name="Denní zápis")
+    photo = models.ForeignKey(Photo, related_name="daily_log_photos", on_delete=models.PROTECT, verbose_name="Fotografie")
+    original_name = models.CharField(max_length=255, verbose_name="Původní název")
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "Fotografie denních zápisů"
+        verbose_name = "Fotografie denního zápisu"
+        constraints = [
+            models.UniqueConstraint(fields=["daily_log", "photo"], name="unique_daily_log_photo"),
+        ]
+
+    def __str__(self):
+        return self.original_name
+
+
+class ProjectDailySummary(models.Model):
+    """
+    Průběžně udržovaný souhrn denních záznamů projektu za jeden den (pro dashboard a analýzy).
+    """
+    project = models.ForeignKey(Project, related_name="daily_summaries", on_delete=models.CASCADE, verbose_name="Projekt")
+    date = models.DateField(verbose_name="Datum")
+    log_count = models.IntegerField(default=0, verbose_name="Počet záznamů")
+    work_time = models.DurationField(default=timedelta(0), verbose_name="Doba práce")
+    material_cost = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="Náklady na materiál")
+    usage_count = models.IntegerField(default=0, verbose_name="Počet použití materiálu")
+    temperature_sum = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    temperature_count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Denní souhrny"
+        verbose_name = "Denní souhrn"
+        constraints = [
+            models.UniqueConstraint(fields=["project", "date"], name="unique_project_daily_summary"),
+        ]
+        indexes = [
+            models.Index(fields=["date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.project_id}"
+
+    @property
+    def average_temperature(self):
+        if not self.temperature_count:
+            return None
+        return self.temperature_sum / self.temperature_count
+
+    @staticmethod
+    def material_cost_subquery():
+        """
+        Korelovaný poddotaz s náklady řádků materiálu pro projekt a den vnějšího souhrnu
+        """
+        def costs(usage_model):
+            return Coalesce(
+                Subquery(
+                    usage_model.objects
+                    .filter(daily_log__project=OuterRef("project"), daily_log__date=OuterRef("date"))
+                    .values("daily_log__project")
+                    .annotate(total=Sum(F("used_quantity") * F("material__price_per_unit")))
+                    .values("total")
+                ),
+                Value(Decimal(0)),
+                output_field=models.DecimalField(),
+            )
+        return costs(MaterialUsage) + costs(ArchivedMaterialUsage)
+
+    @classmethod
+    def apply_delta(cls, project_id, date, **deltas):
+        """
+        Přičte hodnoty k souhrnu (project, date) atomickým UPDATE, chybějící souhrn založí.
+        """
+        deltas = {field: value for field, value in deltas.items() if value}
+        if project_id is None or not deltas:
+            return
+        changes = {field: F(field) + value for field, value in deltas.items()}
+        if cls.objects.filter(project_id=project_id, date=date).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(project_id=project_id, date=date, **deltas)
+        except IntegrityError:
+            # souhrn mezitím založil souběžný zápis
+            cls.objects.filter(project_id=project_id, date=date).update(**changes)
+
+    @classmethod
+    def log_deltas(cls, daily_log, sign):
+        """
+        Příspěvek jednoho denního záznamu do souhrnu (sign=1 přičte, -1 odečte).
+        """
+        has_temperature = daily_log.temperature is not None
+        return {
+            "log_count": sign,
+            "work_time": daily_log.work_time * sign,
+            "temperature_sum": daily_log.temperature * sign if has_temperature else 0,
+            "temperature_count": sign if has_temperature else 0,
+        }
+
+    @classmethod
+    def apply_log(cls, daily_log, sign):
+        cls.apply_delta(daily_log.project_id, daily_log.date, **cls.log_deltas(daily_log, sign))
+
+    @classmethod
+    def rebuild(cls, project_ids=None):
+        """
+        Znovu sestaví souhrny z denních záznamů a řádků materiálu, aktivních i archivovaných
+        (po dvou seskupených dotazech).
+        """
+        summaries = cls.objects.all()
+        if project_ids is not None:
+            summaries = summaries.filter(project_id__in=project_ids)
+
+        rows = {}
+        for log_model, usage_model in ((DailyLog, MaterialUsage), (ArchivedDailyLog, ArchivedMaterialUsage)):
+            logs = log_model.objects.filter(project__isnull=False)
+            usages = usage_model.objects.filter(daily_log__project__isnull=False)
+            if project_ids is not None:
+                logs = logs.filter(project_id__in=project_ids)
+                usages = usages.filter(daily_log__project_id__in=project_ids)
+
+            for row in logs.values("project_id", "date").annotate(
+                    log_count=models.Count("pk"),
+                    work_time=Sum("work_time"),
+                    temperature_sum=Sum("temperature"),
+                    temperature_count=models.Count("temperature"),
+            ).order_by():
+                key = (row.pop("project_id"), row.pop("date"))
+                summary = rows.setdefault(key, cls(project_id=key[0], date=key[1], work_time=timedelta(0)))
+                summary.log_count += row["log_count"]
+                summary.work_time += row["work_time"]
+                summary.temperature_sum += row["temperature_sum"] or 0
+                summary.temperature_count += row["temperature_count"]
+
+            for row in usages.values("daily_log__project_id", "daily_log__date").annotate(
+                    material_cost=Sum(F("used_quantity") * F("material__price_per_unit")),
+                    usage_count=models.Count("pk"),
+            ).order_by():
+                summary = rows[(row["daily_log__project_id"], row["daily_log__date"])]
+                summary.material_cost += row["material_cost"] or 0
+                summary.usage_count += row["usage_count"]
+
+        with transaction.atomic():
+            summaries.delete()
+            cls.objects.bulk_create(rows.values(), batch_size=1000)
+        return len(rows)
+
+
+# počet řádků přesouvaných do archivu a zpět jedním INSERT a DELETE
+ARCHIVE_BATCH_SIZE = getattr(settings, "ARCHIVE_BATCH_SIZE", 1000)
+
 
-        #  přepočet celkových nákladů
-        self.daily_log.project.update_total_cost()
+class ArchivedDailyLog(models.Model):
+    """
+    Denní záznam dokončeného projektu přesunutý z DailyLog (viz ProjectArchive). Má stejné sloupce
+    i primární klíč, odkazy na záznam a kurzory stránkování tak zůstávají platné.
+    """
+    is_archived = True
+
+    id = models.BigIntegerField(primary_key=True)
+    project = models.ForeignKey(Project, related_name="archived_daily_logs", on_delete=models.PROTECT, null=True, verbose_name="Projekt")
+    title = models.CharField(max_length=150, null=True, verbose_name="Název")
+    description = models.TextField(null=True, blank=True, verbose_name="Popis činnosti")
+    date = models.DateField(verbose_name="Datum")
+    work_time = models.DurationField(verbose_name="Doba práce")
+    temperature = models.DecimalField(max_digits=20, decimal_places=2, null=True, blank=True, verbose_name="Teplota")
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        verbose_name_plural = "Archivované denní zápisy"
+        verbose_name = "Archivovaný denní zápis"
+        indexes = [
+            models.Index(fields=["project", "date"]),
+            models.Index(fields=["date", "id"]),
+            SearchVectorIndex(fields=["search_vector"], name="archiveddailylog_search_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.project.name}"
+
+    @staticmethod
+    def with_usages(queryset=None):
+        if queryset is None:
+            queryset = ArchivedDailyLog.objects.all()
+        return queryset.select_related("project").prefetch_related(
+            Prefetch("daily_usages", queryset=ArchivedMaterialUsage.objects.select_related("material"))
+        )
+
+
+# materiál archivovaného řádku se nesmí smazat (obnova projektu a náklady archivu ho potřebují),
+# pohledy na ProtectedError vrací tuto chybu
+MATERIAL_IN_ARCHIVE_ERROR = "Materiál používají archivované projekty, nelze ho smazat"
+
+
+class ArchivedMaterialUsage(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    daily_log = models.ForeignKey(ArchivedDailyLog, related_name="daily_usages", on_delete=models.CASCADE)
+    material = models.ForeignKey(Material, related_name="archived_usages", on_delete=models.PROTECT)
+    used_quantity = models.IntegerField(verbose_name="Použité množství")
+
+    class Meta:
+        verbose_name_plural = "Archivované použité materiály"
+        verbose_name = "Archivovaný použitý materiál"
+        indexes = [
+            models.Index(fields=["material", "daily_log"]),
+        ]
+
+    def __str__(self):
+        return f"{self.daily_log.date} - {self.material.name}"
+
+    def cost(self):
+        return self.used_quantity * (self.material.price_per_unit or 0)
+
+
+class ArchivedDailyLogPhoto(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    daily_log = models.ForeignKey(ArchivedDailyLog, related_name="photos", on_delete=models.CASCADE, verbose_name="Denní zápis")
+    photo = models.ForeignKey(Photo, related_name="archived_daily_log_photos", on_delete=models.PROTECT, verbose_name="Fotografie")
+    original_name = models.CharField(max_length=255, verbose_name="Původní název")
+    uploaded_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name_plural = "Archivované fotografie denních zápisů"
+        verbose_name = "Archivovaná fotografie denního zápisu"
+
+    def __str__(self):
+        return self.original_name
+
+
+class ProjectArchive(models.Model):
+    """
+    Archiv dokončeného projektu: jeho denní záznamy, řádky materiálu a fotografie leží
+    v tabulkách Archived*, tady jsou předpočítané souhrnné hodnoty za celý projekt.
+    Denní souhrny (ProjectDailySummary) a total_cost se archivací nemění.
+    """
+    project = models.OneToOneField(Project, related_name="archive", on_delete=models.CASCADE, verbose_name="Projekt")
+    archived_at = models.DateTimeField(default=timezone.now, verbose_name="Archivováno")
+    log_count = models.IntegerField(default=0, verbose_name="Počet záznamů")
+    usage_count = models.IntegerField(default=0, verbose_name="Počet použití materiálu")
+    first_date = models.DateField(null=True, blank=True, verbose_name="První záznam")
+    last_date = models.DateField(null=True, blank=True, verbose_name="Poslední záznam")
+    work_time = models.DurationField(default=timedelta(0), verbose_name="Doba práce")
+    material_cost = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="Náklady na materiál")
+
+    class Meta:
+        verbose_name_plural = "Archivy projektů"
+        verbose_name = "Archiv projektu"
+
+    def __str__(self):
+        return f"{self.project} ({self.log_count} záznamů)"
+
+    @staticmethod
+    def move_rows(queryset, target_model, batch_size=ARCHIVE_BATCH_SIZE):
+        """
+        Přesune řádky dotazu do tabulky target_model se stejnými sloupci (včetně pk) po dávkách
+        INSERT ... SELECT + DELETE. Obojí jde přímo na databázi bez signálů a pre_save - sklad,
+        náklady ani souhrny se nemění a časy nahrání fotografií zůstanou původní. Cizí klíče se
+        kontrolují až při commitu, na pořadí tabulek v transakci proto nezáleží.
+        """
+        connection = connections[queryset.db]
+        quote_name = connection.ops.quote_name
+        columns = ", ".join(
+            quote_name(field.column) for field in target_model._meta.concrete_fields
+            if not isinstance(field, SearchVectorField)
+        )
+        source_table = quote_name(queryset.model._meta.db_table)
+        target_table = quote_name(target_model._meta.db_table)
+        pk_column = quote_name(queryset.model._meta.pk.column)
+        moved = 0
+        while True:
+            pks = list(queryset.order_by("pk").values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                return moved
+            placeholders = ", ".join(["%s"] * len(pks))
+            # ORM nemá veřejné API pro přesun řádků mezi tabulkami: bulk_create by volal pre_save
+            # (auto_now_add) a QuerySet.delete() signály a kaskádu, proto čisté SQL
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {target_table} ({columns}) "
+                    f"SELECT {columns} FROM {source_table} WHERE {pk_column} IN ({placeholders})",
+                    pks,
+                )
+                cursor.execute(f"DELETE FROM {source_table} WHERE {pk_column} IN ({placeholders})", pks)
+            moved += len(pks)
+
+    @classmethod
+    def archive(cls, project, batch_size=ARCHIVE_BATCH_SIZE):
+        """
+        Přesune denní záznamy dokončeného projektu do archivu a uloží jeho souhrn. Vrací
+        ProjectArchive, nebo None, pokud projekt mezitím přestal být dokončený.
+        """
+        with transaction.atomic():
+            # zámek projektu - souběžné znovuotevření počká na konec archivace
+            if not Project.objects.select_for_update().filter(pk=project.pk, status="completed").exists():
+                return None
+            cls.move_rows(DailyLogPhoto.objects.filter(daily_log__project=project), ArchivedDailyLogPhoto, batch_size)
+            cls.move_rows(MaterialUsage.objects.filter(daily_log__project=project), ArchivedMaterialUsage, batch_size)
+            cls.move_rows(DailyLog.objects.filter(project=project), ArchivedDailyLog, batch_size)
+            update_search_vectors(ArchivedDailyLog.objects.filter(project=project))
+            caching.invalidate("project", project.pk)
+
+            totals = project.daily_summaries.aggregate(
+                log_count=Coalesce(Sum("log_count"), 0),
+                usage_count=Coalesce(Sum("usage_count"), 0),
+                first_date=Min("date"),
+                last_date=models.Max("date"),
+                work_time=Coalesce(Sum("work_time"), Value(timedelta(0))),
+                material_cost=Coalesce(Sum("material_cost"), Value(Decimal(0))),
+            )
+            archive, _ = cls.objects.update_or_create(
+                project=project, defaults={**totals, "archived_at": timezone.now()}
+            )
+        return archive
+
+    @classmethod
+    def restore(cls, project, batch_size=ARCHIVE_BATCH_SIZE):
+        """
+        Vrátí archivované záznamy projektu zpět do aktivních tabulek. Vrací počet vrácených záznamů.
+        """
+        with transaction.atomic():
+            cls.move_rows(ArchivedDailyLogPhoto.objects.filter(daily_log__project=project), DailyLogPhoto, batch_size)
+            cls.move_rows(ArchivedMaterialUsage.objects.filter(daily_log__project=project), MaterialUsage, batch_size)
+            restored = cls.move_rows(ArchivedDailyLog.objects.filter(project=project), DailyLog, batch_size)
+            update_search_vectors(DailyLog.objects.filter(project=project))
+            cls.objects.filter(project=project).delete()
+            caching.invalidate("project", project.pk)
+        return restored
+
+# odložení přepočtu - opakované požadavky pro stejný projekt v tomto okně se sloučí do jedné úlohy
+RECOMPUTE_DEBOUNCE = getattr(settings, "RECOMPUTE_DEBOUNCE", timedelta(seconds=30))
+# úloha rozpracovaná déle než tento limit (spadlý worker) se může převzít znovu
+RECOMPUTE_JOB_TIMEOUT = getattr(settings, "RECOMPUTE_JOB_TIMEOUT", timedelta(minutes=10))
+
+
+class RecomputeJob(models.Model):
+    """
+    Fronta přepočtů souhrnných hodnot projektu v databázi aplikace, zpracovává ji příkaz
+    run_recompute_worker. Pro každý projekt a druh čeká nejvýše jedna úloha.
+    """
+    KIND_CHOICES = [
+        ("project_cost", "Náklady projektu"),
+        ("daily_summaries", "Denní souhrny"),
+        ("restore_archive", "Obnova archivu"),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES, verbose_name="Druh")
+    project = models.ForeignKey(Project, related_name="recompute_jobs", on_delete=models.CASCADE, verbose_name="Projekt")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Vytvořeno")
+    run_after = models.DateTimeField(verbose_name="Spustit po")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Zahájeno")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Pokusy")
+    last_error = models.TextField(null=True, blank=True, verbose_name="Poslední chyba")
+
+    class Meta:
+        verbose_name_plural = "Úlohy přepočtu"
+        verbose_name = "Úloha přepočtu"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "project"],
+                condition=Q(started_at__isnull=True),
+                name="unique_pending_recompute_job",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["started_at", "run_after"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.project_id}"
+
+    @staticmethod
+    def schedule(kind, project_ids, delay=RECOMPUTE_DEBOUNCE):
+        """
+        Naplánuje přepočet projektů jedním INSERT. Čeká-li už na projekt úloha stejného druhu,
+        nic se nepřidá - požadavky v okně delay se tak sloučí. Úloha je součástí aktuální
+        transakce, při jejím zrušení se nenaplánuje.
+        """
+        project_ids = {project_id for project_id in project_ids if project_id}
+        run_after = timezone.now() + delay
+        RecomputeJob.objects.bulk_create(
+            [RecomputeJob(kind=kind, project_id=project_id, run_after=run_after) for project_id in project_ids],
+            ignore_conflicts=True,
+        )
+        # kratší odklad (např. ruční přepočet) čekající úlohu uspíší
+        RecomputeJob.objects.filter(
+            kind=kind, project_id__in=project_ids, started_at__isnull=True, run_after__gt=run_after
+        ).update(run_after=run_after)
+
+    @staticmethod
+    def claim(limit):
+        """
+        Převezme až limit splatných úloh (i úloh spadlého workeru). Souběžní workeři se
+        díky SKIP LOCKED nepřekrývají.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            jobs = list(
+                RecomputeJob.objects
+                .filter(
+                    Q(started_at__isnull=True, run_after__lte=now)
+                    | Q(started_at__lt=now - RECOMPUTE_JOB_TIMEOUT)
+                )
+                .order_by("run_after")
+                .select_for_update(skip_locked=True)[:limit]
+            )
+            RecomputeJob.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                started_at=now, attempts=F("attempts") + 1
+            )
+        return jobs
+
+    def run(self):
+        """
+        Provede úlohu; po úspěchu ji smaže, po chybě ji naplánuje znovu s odstupem.
+        """
+        try:
+            with transaction.atomic():
+                if self.kind == "project_cost":
+                    Project.objects.filter(pk=self.project_id).update(total_cost=Project.total_cost_subquery())
+                    caching.invalidate("project", self.project_id)
+                elif self.kind == "daily_summaries":
+                    ProjectDailySummary.rebuild([self.project_id])
+                elif self.kind == "restore_archive":
+                    ProjectArchive.restore(self.project)
+                else:
+                    raise ValueError(f"Neznámý druh úlohy: {self.kind}")
+        except Exception as error:
+            self.retry(error)
+            raise
+        RecomputeJob.objects.filter(pk=self.pk).delete()
+
+    def retry(self, error):
+        attempts = self.attempts + 1
+        try:
+            with transaction.atomic():
+                RecomputeJob.objects.filter(pk=self.pk).update(
+                    started_at=None,
+                    run_after=timezone.now() + RECOMPUTE_DEBOUNCE * min(2 ** attempts, 64),
+                    last_error=repr(error),
+                )
+        except IntegrityError:
+            # mezitím se naplánovala nová úloha pro stejný projekt, ta práci převezme
+            RecomputeJob.objects.filter(pk=self.pk).delete()
+
+    @staticmethod
+    def stats():
+        """
+        Hloubka fronty a zpoždění nejstarší splatné úlohy (v sekundách).
+        """
+        now = timezone.now()
+        pending = RecomputeJob.objects.filter(started_at__isnull=True)
+        totals = pending.aggregate(
+            depth=models.Count("pk"),
+            ready=models.Count("pk", filter=Q(run_after__lte=now)),
+            oldest_due=Min("run_after", filter=Q(run_after__lte=now)),
+        )
+        oldest_due = totals.pop("oldest_due")
+        return {
+            **totals,
+            "running": RecomputeJob.objects.filter(started_at__isnull=False).count(),
+            "lag_seconds": round((now - oldest_due).total_seconds(), 1) if oldest_due else 0,
+        }
+
+
+def deleted_with_material(origin):
+    """
+    Maže se řádek kaskádou ze smazání jeho materiálu (instance nebo QuerySet materiálů)?
+    Jinou cestou než přes svůj materiál kaskáda z materiálů na řádky nevede.
+    """
+    if isinstance(origin, Material):
+        return True
+    return isinstance(origin, models.QuerySet) and origin.model is Material
 
 
 @receiver(post_delete, sender=MaterialUsage)
-def return_material_stock(sender, instance, **kwargs):
+def return_material_stock(sender, instance, origin=None, **kwargs):
+    """
+    Vrátí použité množství materiálu zpět a odečte náklady řádku od projektu a denního souhrnu.
+    """
+    # Vrácení použitého množství do skladu - ne při mazání samotného materiálu, pohyb skladu
+    # by odkazoval na materiál, který se v téže transakci maže
+    if instance.material_id and not deleted_with_material(origin):
+        Material.adjust_stock(instance.material_id, instance.used_quantity)
+
+    # Odečtení nákladů řádku od projektu
+    if instance.daily_log and instance.daily_log.project_id:
+        MaterialUsage.apply_totals(instance.daily_log, -instance.cost(), -1)
+
+
+@receiver(post_delete, sender=DailyLog)
+def remove_daily_log_summary(sender, instance, **kwargs):
     """
-    Vrátí použité množství materiálu zpět a přepočítá celkové náklady projektu.
+    Odečte smazaný denní záznam z denního souhrnu projektu.
     """
-    # Vrácení použitého množství do skladu
-    if instance.material:
-        instance.material.quantity += instance.used_quantity
-        instance.material.save()
+    ProjectDailySummary.apply_log(instance, -1)
 
-    # # Přepočet celkových nákladů projektu
-    if instance.daily_log and instance.daily_log.project:
-        instance.daily_log.project.update_total_cost()
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+@receiver(post_save, sender=Material)
+@receiver(post_delete, sender=Material)
+@receiver(post_save, sender=DailyLog)
+@receiver(post_delete, sender=DailyLog)
+def invalidate_api_cache(sender, instance, **kwargs):
+    """
+    Zneplatní uložené API odpovědi a fragmenty řádků HTML seznamů změněného projektu,
+    materiálu nebo denního záznamu.
+    """
+    caching.invalidate(sender._meta.model_name, instance.pk)
+
+
+@receiver(post_save, sender=DailyLogPhoto)
+@receiver(post_delete, sender=DailyLogPhoto)
+def invalidate_daily_log_row(sender, instance, **kwargs):
+    """
+    Fotografie se vypisují v řádku denního záznamu.
+    """
+    caching.invalidate("dailylog", instance.daily_log_id)
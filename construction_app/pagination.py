@@ -0,0 +1,225 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.utils.urls import replace_query_param
+
+# výchozí a maximální počet záznamů na stránku
+KEYSET_PAGE_SIZE = getattr(settings, "KEYSET_PAGE_SIZE", 50)
+KEYSET_MAX_PAGE_SIZE = getattr(settings, "KEYSET_MAX_PAGE_SIZE", 500)
+# od tohoto odhadu počtu řádků tabulky se nefiltrovaný výpis v adminu nepočítá přes COUNT(*)
+ESTIMATED_COUNT_THRESHOLD = getattr(settings, "ESTIMATED_COUNT_THRESHOLD", 100000)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    """
+    Zakóduje hodnoty klíče posledního řádku do neprůhledného řetězce pro URL.
+    """
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def ordering_field(queryset, name):
+    """
+    Pole modelu (nebo výstupní pole anotace) pro položku řazení, např. "pk", "date", "search_rank".
+    """
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+    model = queryset.model
+    *path, name = name.split("__")
+    for part in path:
+        model = model._meta.get_field(part).related_model
+    return model._meta.pk if name == "pk" else model._meta.get_field(name)
+
+
+def decode_cursor(cursor, queryset, ordering):
+    """
+    Dekóduje kurzor a převede jeho hodnoty na typy polí řazení. Cokoli jiného než seznam
+    odpovídající délky s platnými hodnotami je InvalidCursor - kurzor přichází od klienta.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor("Neplatný kurzor")
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise InvalidCursor("Neplatný kurzor")
+    converted = []
+    for field, value in zip(ordering, values):
+        if value is None or isinstance(value, (dict, list)):
+            raise InvalidCursor("Neplatný kurzor")
+        try:
+            converted.append(ordering_field(queryset, field.lstrip("-")).to_python(value))
+        except (ValidationError, TypeError, ValueError, OverflowError):
+            raise InvalidCursor("Neplatný kurzor")
+    return converted
+
+
+def get_page_size(value):
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        return KEYSET_PAGE_SIZE
+    return max(1, min(page_size, KEYSET_MAX_PAGE_SIZE))
+
+
+def keyset_filter(ordering, values):
+    """
+    Sestaví podmínku "za posledním řádkem" pro dané řazení, např. pro ("-date", "-pk"):
+    date < d OR (date = d AND pk < p). Při indexu nad klíčem stojí každá stránka stejně.
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def keyset_queryset(queryset, ordering, cursor, page_size):
+    """
+    Dotaz na jednu stránku - o řádek delší, aby se poznalo, zda existuje další stránka.
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = decode_cursor(cursor, queryset, ordering)
+        queryset = queryset.filter(keyset_filter(ordering, values))
+    return queryset[:page_size + 1]
+
+
+def split_page(objects, ordering, page_size):
+    next_cursor = None
+    if len(objects) > page_size:
+        objects = objects[:page_size]
+        last = objects[-1]
+        next_cursor = encode_cursor([getattr(last, field.lstrip("-")) for field in ordering])
+    return objects, next_cursor
+
+
+def merge_sorted(rows, ordering, key):
+    """
+    Seřadí spojené stránky z více tabulek podle ordering (key(row) vrací hodnoty klíče).
+    Stabilní řazení po jednotlivých polích od posledního zachová i sestupné směry.
+    """
+    for index in reversed(range(len(ordering))):
+        rows.sort(key=lambda row: key(row)[index], reverse=ordering[index].startswith("-"))
+    return rows
+
+
+def keyset_rows(queryset, ordering, cursor, page_size, fetch, key):
+    """
+    Řádky jedné stránky z dotazu, nebo ze seznamu dotazů se stejným klíčem (např. aktivní
+    a archivované denní záznamy) - z každého nejvýše page_size + 1 řádků, spojené podle klíče.
+    """
+    if not isinstance(queryset, (list, tuple)):
+        return fetch(keyset_queryset(queryset, ordering, cursor, page_size))
+    rows = [row for part in queryset for row in fetch(keyset_queryset(part, ordering, cursor, page_size))]
+    return merge_sorted(rows, ordering, key)[:page_size + 1]
+
+
+def paginate_keyset(queryset, ordering, cursor=None, page_size=KEYSET_PAGE_SIZE):
+    """
+    Vrátí jednu stránku (seznam objektů) a kurzor další stránky, nebo None na konci.
+    Místo OFFSET se pokračuje podle hodnot klíče posledního řádku předchozí stránky.
+    """
+    keys = [field.lstrip("-") for field in ordering]
+    objects = keyset_rows(
+        queryset, ordering, cursor, page_size, list,
+        key=lambda obj: [getattr(obj, name) for name in keys],
+    )
+    return split_page(objects, ordering, page_size)
+
+
+def paginate_keyset_values(queryset, ordering, fields, cursor=None, page_size=KEYSET_PAGE_SIZE):
+    """
+    Jako paginate_keyset, ale vrací n-tice values_list(*fields) místo instancí modelu.
+    Hodnoty klíče řazení se čtou navíc na konci řádku a do výsledku se nepřidávají.
+    """
+    keys = [field.lstrip("-") for field in ordering]
+    rows = keyset_rows(
+        queryset, ordering, cursor, page_size,
+        lambda page: list(page.values_list(*fields, *keys)),
+        key=lambda row: row[len(fields):],
+    )
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(list(rows[-1][len(fields):]))
+    return [row[:len(fields)] for row in rows], next_cursor
+
+
+async def apaginate_keyset(queryset, ordering, cursor=None, page_size=KEYSET_PAGE_SIZE):
+    """
+    Asynchronní varianta paginate_keyset pro async pohledy.
+    """
+    objects = [obj async for obj in keyset_queryset(queryset, ordering, cursor, page_size).aiterator()]
+    return split_page(objects, ordering, page_size)
+
+
+def get_next_link(request, next_cursor):
+    """
+    Absolutní URL další stránky pro API odpověď, nebo None na konci.
+    """
+    if not next_cursor:
+        return None
+    return replace_query_param(request.build_absolute_uri(), "cursor", next_cursor)
+
+
+class KeysetPaginationMixin:
+    """
+    Mixin pro ListView - nahrazuje stránkování přes OFFSET kurzorem (?cursor=...&page_size=...).
+    """
+    keyset_ordering = ("pk",)
+
+    def get_keyset_page(self, queryset):
+        page_size = get_page_size(self.request.GET.get("page_size"))
+        try:
+            return paginate_keyset(queryset, self.keyset_ordering, self.request.GET.get("cursor"), page_size)
+        except InvalidCursor:
+            # neplatný kurzor - začne se od první stránky
+            return paginate_keyset(queryset, self.keyset_ordering, None, page_size)
+
+    def get_context_data(self, **kwargs):
+        objects, next_cursor = self.get_keyset_page(self.object_list)
+        query = self.request.GET.copy()
+        query.pop("cursor", None)
+        if next_cursor:
+            query["cursor"] = next_cursor
+        kwargs.update({
+            "object_list": objects,
+            "next_cursor": next_cursor,
+            "next_page_query": query.urlencode() if next_cursor else None,
+        })
+        return super().get_context_data(**kwargs)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator pro admin velkých tabulek - nefiltrovaný výpis na PostgreSQL bere počet řádků
+    z odhadu statistik (pg_class.reltuples) místo COUNT(*) přes celou tabulku. Filtrované
+    výpisy a malé tabulky se počítají přesně.
+    """
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == "postgresql" and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [connection.ops.quote_name(queryset.model._meta.db_table)],
+                )
+                row = cursor.fetchone()
+            # -1 = tabulka ještě nebyla analyzována
+            if row and row[0] >= ESTIMATED_COUNT_THRESHOLD:
+                return row[0]
+        return super().count
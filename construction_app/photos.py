@@ -0,0 +1,142 @@
+import hashlib
+import logging
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from PIL import Image
+
+from .models import Photo
+from .thumbnails import make_thumbnails
+
+logger = logging.getLogger(__name__)
+
+# počet procesů pro generování náhledů mimo webové workery
+PHOTO_THUMBNAIL_WORKERS = getattr(settings, "PHOTO_THUMBNAIL_WORKERS", 2)
+
+# povolené formáty podle obsahu souboru (Pillow): MIME typ a přípona uloženého originálu
+PHOTO_FORMATS = {
+    "JPEG": ("image/jpeg", ".jpg"),
+    "PNG": ("image/png", ".png"),
+    "WEBP": ("image/webp", ".webp"),
+    "GIF": ("image/gif", ".gif"),
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        # spawn - podřízené procesy nedědí databázová spojení ani vlákna serveru
+        _executor = ProcessPoolExecutor(max_workers=PHOTO_THUMBNAIL_WORKERS, mp_context=get_context("spawn"))
+    return _executor
+
+
+def identify_photo(uploaded_file):
+    """
+    Ověří obsah souboru Pillow a vrátí jeho formát z PHOTO_FORMATS, jinak None. Typu a příponě
+    od klienta se nevěří - HTML nebo SVG s příponou .jpg by se jinak servíroval jako obrázek.
+    """
+    uploaded_file.seek(0)
+    try:
+        with Image.open(uploaded_file) as image:
+            image_format = image.format
+            image.verify()
+    except Exception:
+        # Pillow hlásí poškozený nebo neznámý obsah různými výjimkami (i DecompressionBombError)
+        return None
+    finally:
+        uploaded_file.seek(0)
+    return image_format if image_format in PHOTO_FORMATS else None
+
+
+def store_photo(uploaded_file):
+    """
+    Po částech zapíše nahraný soubor na disk a spočítá jeho SHA-256. Soubor se uloží pod hashem
+    obsahu, takže stejná fotka nahraná z více zařízení je na disku jen jednou. Přípona a MIME typ
+    se odvodí z formátu zjištěného z obsahu, soubor, který není povoleným obrázkem, se odmítne.
+    """
+    image_format = identify_photo(uploaded_file)
+    if image_format is None:
+        raise ValidationError(f"Soubor {uploaded_file.name} není podporovaný obrázek")
+    content_type, extension = PHOTO_FORMATS[image_format]
+
+    photos_root = os.path.join(settings.MEDIA_ROOT, "photos")
+    os.makedirs(photos_root, exist_ok=True)
+
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=photos_root, suffix=".upload", delete=False) as temporary:
+        for chunk in uploaded_file.chunks():
+            digest.update(chunk)
+            temporary.write(chunk)
+    sha256 = digest.hexdigest()
+
+    existing = Photo.objects.filter(sha256=sha256).first()
+    if existing:
+        os.remove(temporary.name)
+        return existing
+
+    name = Photo.original_path(sha256, extension)
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(temporary.name, path)
+
+    try:
+        with transaction.atomic():
+            photo = Photo.objects.create(
+                sha256=sha256,
+                file=name,
+                size=uploaded_file.size,
+                content_type=content_type,
+            )
+    except IntegrityError:
+        # stejný obsah mezitím uložil souběžný požadavek (soubor je totožný)
+        return Photo.objects.get(sha256=sha256)
+
+    transaction.on_commit(lambda: schedule_thumbnails(photo))
+    return photo
+
+
+def thumbnail_targets(photo):
+    return [
+        (os.path.join(settings.MEDIA_ROOT, photo.thumbnail_path(size_name)), size)
+        for size_name, size in Photo.THUMBNAIL_SIZES.items()
+    ]
+
+
+def schedule_thumbnails(photo):
+    """
+    Předá generování náhledů procesu na pozadí, požadavek na něj nečeká.
+    """
+    future = get_executor().submit(make_thumbnails, photo.file.path, thumbnail_targets(photo))
+    future.add_done_callback(lambda done: _thumbnails_done(photo.pk, done))
+
+
+def _thumbnails_done(photo_pk, future):
+    error = future.exception()
+    try:
+        if error:
+            logger.error("Náhledy fotografie %s se nepodařilo vytvořit: %r", photo_pk, error)
+            Photo.mark_thumbnails_failed(photo_pk, error)
+        else:
+            Photo.mark_thumbnails_ready(photo_pk)
+    finally:
+        # callback běží ve vlákně executoru, jeho spojení se jinak neuzavře
+        connection.close()
+
+
+def generate_thumbnails(photo):
+    """
+    Synchronní varianta pro dávkové doplnění chybějících náhledů, chyba se zaznamená u fotografie.
+    """
+    try:
+        make_thumbnails(photo.file.path, thumbnail_targets(photo))
+    except Exception as error:
+        Photo.mark_thumbnails_failed(photo.pk, error)
+        raise
+    Photo.mark_thumbnails_ready(photo.pk)
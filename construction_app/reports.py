@@ -0,0 +1,53 @@
+import csv
+import heapq
+
+from .models import ArchivedDailyLog, DailyLog
+
+REPORT_HEADER = [
+    "Datum", "Název", "Popis", "Doba práce", "Teplota",
+    "Materiál", "Jednotka", "Použité množství", "Cena za jednotku", "Náklady",
+]
+
+
+class Echo:
+    """
+    Pseudo-buffer pro csv.writer - write() hodnotu jen vrátí, aby šla rovnou odeslat klientovi
+    """
+    def write(self, value):
+        return value
+
+
+def iter_project_report_rows(project, chunk_size=2000):
+    """
+    Vrací řádky reportu projektu (jeden řádek na použitý materiál, záznam bez materiálu má jeden
+    prázdný řádek). Čte se serverovým kurzorem po dávkách, paměť tak nezávisí na délce projektu.
+    Aktivní a archivované záznamy se slévají podle (datum, pk).
+    """
+    parts = [
+        log_model.objects
+        .filter(project=project)
+        .order_by("date", "pk", "daily_usages__pk")
+        .values_list(
+            "date", "pk", "title", "description", "work_time", "temperature",
+            "daily_usages__material__name", "daily_usages__material__unit",
+            "daily_usages__used_quantity", "daily_usages__material__price_per_unit",
+        )
+        .iterator(chunk_size=chunk_size)
+        for log_model in (DailyLog, ArchivedDailyLog)
+    ]
+    rows = heapq.merge(*parts, key=lambda row: row[:2])
+    for date, _, title, description, work_time, temperature, material, unit, used_quantity, price_per_unit in rows:
+        cost = used_quantity * price_per_unit if used_quantity is not None and price_per_unit is not None else None
+        yield [date, title, description, work_time, temperature, material, unit, used_quantity, price_per_unit, cost]
+
+
+def iter_project_report_csv(project):
+    """
+    Vrací report projektu jako postupně generované řádky CSV.
+    """
+    writer = csv.writer(Echo(), delimiter=";")
+    # BOM, aby Excel poznal UTF-8, a zároveň první bajt odpovědi bez čekání na databázi
+    yield "\ufeff"
+    yield writer.writerow(REPORT_HEADER)
+    for row in iter_project_report_rows(project):
+        yield writer.writerow(["" if value is None else value for value in row])
@@ -0,0 +1,124 @@
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections, models
+from django.db.migrations.operations.base import Operation
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Cast
+
+# konfigurace fulltextu PostgreSQL; "simple" funguje všude, "simple_unaccent" (viz
+# CreateUnaccentSearchConfig) i česká konfigurace (např. "czech" nad ispell slovníkem) se musí
+# v databázi nejdřív vytvořit
+SEARCH_CONFIG = getattr(settings, "DAILY_LOG_SEARCH_CONFIG", "simple")
+
+
+class CreateUnaccentSearchConfig(Operation):
+    """
+    Migrační operace, která vytvoří konfiguraci fulltextu jako "simple", jen slova nejdřív
+    projdou slovníkem unaccent - "beton" pak najde "betón" a dotazy bez diakritiky fungují.
+    Potřebuje rozšíření unaccent, do migrace se přidá za něj:
+
+        from django.contrib.postgres.operations import UnaccentExtension
+
+        operations = [UnaccentExtension(), CreateUnaccentSearchConfig()]
+
+    Po změně DAILY_LOG_SEARCH_CONFIG se uložené vektory přepočítají příkazem update_search_vectors.
+    Na jiných databázích než PostgreSQL nic nedělá.
+    """
+    reversible = True
+
+    def __init__(self, name="simple_unaccent"):
+        self.name = name
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        name = schema_editor.quote_name(self.name)
+        schema_editor.execute(f"CREATE TEXT SEARCH CONFIGURATION {name} (COPY = simple)")
+        schema_editor.execute(
+            f"ALTER TEXT SEARCH CONFIGURATION {name} ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple"
+        )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        schema_editor.execute(f"DROP TEXT SEARCH CONFIGURATION IF EXISTS {schema_editor.quote_name(self.name)}")
+
+    def describe(self):
+        return f"Creates text search configuration {self.name} with unaccent"
+
+    @property
+    def migration_name_fragment(self):
+        return f"create_search_config_{self.name}"
+
+
+class SearchVectorIndex(GinIndex):
+    """
+    GIN index nad sloupcem tsvector. Na jiných databázích (SQLite v testech) obyčejný index,
+    aby šly spustit migrace.
+    """
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        if schema_editor.connection.vendor != "postgresql":
+            return models.Index.create_sql(self, model, schema_editor, using=using, **kwargs)
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+
+class PrefixSearchIndex(models.Index):
+    """
+    Index pro hledání podle začátku bez ohledu na velikost písmen (istartswith, v adminu
+    search_fields "^name"), např. PrefixSearchIndex(OpClass(Upper("name"), name="text_pattern_ops")).
+    PostgreSQL porovnává UPPER(name::text) LIKE 'ABC%' a bez pattern_ops by index při jiné než
+    C kolaci nepoužil. Na jiných databázích se operátorová třída vynechá.
+    """
+    def create_sql(self, model, schema_editor, using="", **kwargs):
+        if schema_editor.connection.vendor != "postgresql":
+            expressions = [
+                expression.get_source_expressions()[0] if isinstance(expression, OpClass) else expression
+                for expression in self.expressions
+            ]
+            return models.Index(*expressions, name=self.name).create_sql(model, schema_editor, using=using, **kwargs)
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+
+def full_text_available(queryset):
+    return connections[queryset.db].vendor == "postgresql"
+
+
+def daily_log_search_vector():
+    """
+    Název má při řazení větší váhu než popis.
+    """
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="B", config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset):
+    """
+    Přepočítá uložený search_vector jedním UPDATE (mimo PostgreSQL nic nedělá).
+    """
+    if not full_text_available(queryset):
+        return 0
+    return queryset.update(search_vector=daily_log_search_vector())
+
+
+def search_daily_logs(queryset, text):
+    """
+    Vyfiltruje denní záznamy odpovídající dotazu a anotuje je relevancí search_rank.
+    Na PostgreSQL přes GIN index nad search_vector, jinde (SQLite) icontains na každé slovo
+    s nulovou relevancí.
+    """
+    if full_text_available(queryset):
+        query = SearchQuery(text, search_type="websearch", config=SEARCH_CONFIG)
+        # ts_rank vrací real - převod na double, aby hodnota v kurzoru přesně odpovídala
+        return queryset.filter(search_vector=query).defer("search_vector").annotate(
+            search_rank=Cast(SearchRank(F("search_vector"), query), FloatField())
+        )
+
+    for word in text.split():
+        queryset = queryset.filter(Q(title__icontains=word) | Q(description__icontains=word))
+    return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
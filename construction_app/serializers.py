@@ -1,4 +1,10 @@
-from rest_framework import serializers
+from collections import defaultdict
+from functools import lru_cache
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 
 from construction_app import models
 
@@ -13,3 +19,147 @@ class MaterialSerializer(serializers.ModelSerializer):
     class Meta:
         model = models.Material
         exclude = ("price_per_unit",)
+
+
+class DailyLogSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.DailyLog
+        fields = ("id", "project", "title", "description", "date", "work_time", "temperature")
+
+
+class MaterialUsageIngestSerializer(serializers.Serializer):
+    material = serializers.IntegerField()
+    used_quantity = serializers.IntegerField(min_value=1)
+
+
+class MaterialUsageSerializer(serializers.ModelSerializer):
+    material_name = serializers.CharField(source="material.name", read_only=True)
+    unit = serializers.CharField(source="material.unit", read_only=True)
+    cost = serializers.DecimalField(max_digits=20, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = models.MaterialUsage
+        fields = ("id", "material", "material_name", "unit", "used_quantity", "cost")
+
+
+class DailyLogDetailSerializer(serializers.ModelSerializer):
+    """
+    Denní záznam s řádky materiálu - queryset má mít select_related("project") a prefetch řádků
+    s materiálem (viz DailyLog.with_usages), jinak se dotazuje po řádcích.
+    """
+    project_name = serializers.CharField(source="project.name", read_only=True, allow_null=True)
+    usages = MaterialUsageSerializer(source="daily_usages", many=True, read_only=True)
+
+    class Meta:
+        model = models.DailyLog
+        fields = (
+            "id", "project", "project_name", "title", "description", "date", "work_time", "temperature", "usages",
+        )
+
+
+class DailyLogCreateSerializer(serializers.ModelSerializer):
+    """
+    Vytvoření denního záznamu s vnořenými řádky materiálu. Materiály se načtou jedním dotazem
+    a řádky se uloží přes MaterialUsage.bulk_create_for_log (sklad i náklady jednou na záznam).
+    """
+    usages = MaterialUsageIngestSerializer(many=True, required=False, default=list)
+
+    class Meta:
+        model = models.DailyLog
+        fields = ("project", "title", "description", "date", "work_time", "temperature", "usages")
+
+    def validate_usages(self, usages):
+        materials = models.Material.objects.in_bulk({usage["material"] for usage in usages})
+        missing = sorted({usage["material"] for usage in usages} - materials.keys())
+        if missing:
+            raise serializers.ValidationError([f"Materiál neexistuje: {pk}" for pk in missing])
+
+        demand = defaultdict(int)
+        for usage in usages:
+            usage["material"] = materials[usage["material"]]
+            demand[usage["material"].pk] += usage["used_quantity"]
+        for pk, quantity in demand.items():
+            if quantity > materials[pk].quantity:
+                raise serializers.ValidationError(f"Nedostatečné množství materiálu: {materials[pk].name}")
+        return usages
+
+    def create(self, validated_data):
+        usages = validated_data.pop("usages")
+        try:
+            with transaction.atomic():
+                daily_log = models.DailyLog.objects.create(**validated_data)
+                models.MaterialUsage.bulk_create_for_log(
+                    daily_log, [models.MaterialUsage(**usage) for usage in usages]
+                )
+        except DjangoValidationError as error:
+            # sklad mezitím vyčerpal souběžný zápis
+            raise serializers.ValidationError({"usages": error.messages})
+        return daily_log
+
+
+class DailyLogIngestSerializer(serializers.Serializer):
+    """
+    Validace jednoho NDJSON záznamu bez dotazů do databáze, cizí klíče se ověřují po dávkách.
+    """
+    project = serializers.IntegerField()
+    title = serializers.CharField(max_length=150, required=False, allow_null=True)
+    description = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+    date = serializers.DateField()
+    work_time = serializers.DurationField()
+    temperature = serializers.DecimalField(max_digits=20, decimal_places=2, required=False, allow_null=True)
+    usages = MaterialUsageIngestSerializer(many=True, required=False, default=list)
+
+
+def fast_converter(field):
+    """
+    Převod hodnoty z values_list() na výstup pole serializeru. Pro běžné typy bez volání
+    to_representation, jinak (nebo při neobvyklém nastavení pole) přes něj.
+    """
+    if isinstance(field, serializers.DecimalField):
+        coerce_to_string = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+        if coerce_to_string and not field.localize and not field.normalize_output:
+            quantize = field.quantize
+            return lambda value: "{:f}".format(quantize(value))
+    elif isinstance(field, serializers.DateField):
+        output_format = getattr(field, "format", api_settings.DATE_FORMAT)
+        if isinstance(output_format, str) and output_format.lower() == ISO_8601:
+            return lambda value: value.isoformat()
+    elif isinstance(field, (serializers.ChoiceField, serializers.CharField, serializers.IntegerField)):
+        # hodnoty z databáze už mají správný typ (str, int)
+        return None
+    elif isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+        # values_list() vrací rovnou primární klíč
+        return None
+    return field.to_representation
+
+
+@lru_cache(maxsize=None)
+def fast_list_fields(serializer_class):
+    """
+    Pro třídu ModelSerializeru vrátí (názvy výstupních polí, cesty pro values_list, převodníky).
+    """
+    names, lookups, converters = [], [], []
+    # výstupní pole jako v Serializer.to_representation (bez polí jen pro zápis)
+    readable_fields = [field for field in serializer_class().fields.values() if not field.write_only]
+    for field in readable_fields:
+        names.append(field.field_name)
+        lookups.append(field.source.replace(".", "__"))
+        converters.append(fast_converter(field))
+    return tuple(names), tuple(lookups), tuple(converters)
+
+
+def fast_list_data(serializer_class, rows):
+    """
+    Serializuje n-tice z values_list(*lookups) do stejných dat jako serializer_class(many=True).data,
+    bez vytváření instancí modelu a volání to_representation po polích.
+    """
+    names, _, converters = fast_list_fields(serializer_class)
+    converted = [(index, converter) for index, converter in enumerate(converters) if converter is not None]
+    results = []
+    for row in rows:
+        values = list(row)
+        for index, converter in converted:
+            if values[index] is not None:
+                values[index] = converter(values[index])
+        results.append(dict(zip(names, values)))
+    return results
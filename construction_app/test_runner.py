@@ -0,0 +1,19 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .caching import locmem_caches
+
+
+class LocMemCacheTestRunner(DiscoverRunner):
+    """
+    Testy mažou cache (caching.get_cache().clear()) - běží proto nad LocMemCache místo sdílené
+    cache ze settings.CACHES, kterou používá běžící server a ostatní procesy.
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_override = override_settings(CACHES=locmem_caches("test"))
+        self.cache_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_override.disable()
+        super().teardown_test_environment(**kwargs)
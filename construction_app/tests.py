@@ -1,3 +1,948 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import tempfile
+import threading
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache.utils import make_template_fragment_key
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+
+from . import caching
+from .models import (
+    ArchivedDailyLog, ArchivedDailyLogPhoto, ArchivedMaterialUsage, DailyLog, DailyLogPhoto, Material,
+    MATERIAL_IN_ARCHIVE_ERROR, MaterialUsage, Photo, Project, ProjectArchive, RECOMPUTE_DEBOUNCE,
+    RECOMPUTE_JOB_TIMEOUT, RecomputeJob, StockMovement,
+)
+from .pagination import decode_cursor, encode_cursor
+from .photos import generate_thumbnails, store_photo
+from .search import SEARCH_CONFIG, search_daily_logs
+from .serializers import (
+    DailyLogSerializer, MaterialSerializer, ProjectSerializer, fast_list_data, fast_list_fields,
+)
+
+
+def create_materials(count, quantity=1000):
+    return [
+        Material.objects.create(name=f"Materiál {number}", unit="ks", quantity=quantity, price=quantity)
+        for number in range(count)
+    ]
+
+
+def create_diary():
+    project = Project.objects.create(name="Rodinný dům", location="Brno", status="in_progress")
+    material = Material.objects.create(name="Cement", unit="kg", quantity=1000, price=Decimal("500.00"))
+    daily_log = DailyLog.objects.create(
+        project=project, title="Základy", date=date(2024, 5, 6), work_time=timedelta(hours=8)
+    )
+    return project, material, daily_log
+
+
+class ProjectTotalCostTests(TestCase):
+    def test_stale_instance_does_not_overwrite_total_cost(self):
+        project, material, daily_log = create_diary()
+        stale = Project.objects.get(pk=project.pk)
+        MaterialUsage(daily_log=daily_log, material=material, used_quantity=10).save()
+        expected = Project.objects.get(pk=project.pk).total_cost
+        self.assertNotEqual(expected, stale.total_cost)
+
+        stale.location = "Olomouc"
+        stale.save()
+
+        project.refresh_from_db()
+        self.assertEqual(project.location, "Olomouc")
+        self.assertEqual(project.total_cost, expected)
+        self.assertEqual(stale.total_cost, expected)
+
+
+class MaterialSaveTests(TestCase):
+    def test_stale_instance_does_not_overwrite_quantity(self):
+        material = Material.objects.create(name="Cement", unit="kg", quantity=1000, price=Decimal("500.00"))
+        stale = Material.objects.get(pk=material.pk)
+        # souběžný odběr mezi načtením a uložením instance
+        Material.adjust_stock(material.pk, -10)
+
+        stale.name = "Cement CEM II"
+        stale.save()
+
+        material.refresh_from_db()
+        self.assertEqual((material.name, material.quantity), ("Cement CEM II", 990))
+        self.assertEqual(stale.quantity, 990)
+        self.assertFalse(StockMovement.objects.filter(material=material, kind="correction").exists())
+
+    def test_changed_quantity_is_corrected_from_current_row(self):
+        material = Material.objects.create(name="Cement", unit="kg", quantity=1000, price=Decimal("500.00"))
+        stale = Material.objects.get(pk=material.pk)
+        Material.adjust_stock(material.pk, -10)
+
+        stale.quantity = 1200
+        stale.save()
+
+        self.assertEqual(StockMovement.objects.get(material=material, kind="correction").quantity, 210)
+        material.refresh_from_db()
+        self.assertEqual(material.quantity, 1200)
+        self.assertEqual(
+            StockMovement.objects.filter(material=material).aggregate(total=Sum("quantity"))["total"], 1200
+        )
+
+
+def run_concurrently(action, threads=8, repeat=10):
+    """
+    Spustí action() repeat krát v každém z threads vláken (každé má vlastní databázové spojení)
+    a vrátí počet úspěšných a odmítnutých (ValidationError) volání.
+    """
+    results = {"done": 0, "rejected": 0}
+    lock = threading.Lock()
+    start = threading.Barrier(threads)
+
+    def worker():
+        try:
+            start.wait()
+            for _ in range(repeat):
+                try:
+                    action()
+                    outcome = "done"
+                except ValidationError:
+                    outcome = "rejected"
+                with lock:
+                    results[outcome] += 1
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results
+
+
+@skipUnlessDBFeature("has_select_for_update")
+class ConcurrentStockWithdrawalTests(TransactionTestCase):
+    """
+    Souběžné odběry ze stejných řádků Material - žádná ztracená aktualizace ani záporný sklad.
+    Vyžaduje databázi s řádkovými zámky (PostgreSQL), SQLite zamyká celou databázi.
+    """
+    def assert_ledger_matches(self, material):
+        material.refresh_from_db()
+        self.assertGreaterEqual(material.quantity, 0)
+        movements = StockMovement.objects.filter(material=material).aggregate(total=Sum("quantity"))["total"]
+        self.assertEqual(material.quantity, movements)
+
+    def test_material_usage_save(self):
+        project, _, daily_log = create_diary()
+        material = Material.objects.create(name="Písek", unit="kg", quantity=50, price=100)
+
+        def withdraw():
+            # čerstvá instance - kontrola v clean() by jinak odmítla odběr už v paměti
+            MaterialUsage(
+                daily_log_id=daily_log.pk, material=Material.objects.get(pk=material.pk), used_quantity=1
+            ).save()
+
+        results = run_concurrently(withdraw)
+
+        self.assertEqual(results["done"], 50)
+        self.assertEqual(results["rejected"], 30)
+        self.assertEqual(MaterialUsage.objects.filter(material=material).count(), 50)
+        self.assert_ledger_matches(material)
+        self.assertEqual(material.quantity, 0)
+
+    def test_withdraw_stock_bulk(self):
+        first = Material.objects.create(name="Písek", unit="kg", quantity=60, price=100)
+        second = Material.objects.create(name="Štěrk", unit="kg", quantity=100, price=100)
+
+        results = run_concurrently(lambda: Material.withdraw_stock_bulk({first.pk: 2, second.pk: 1}))
+
+        # první materiál vystačí na 30 odběrů, odmítnuté odběry nesmí změnit ani druhý
+        self.assertEqual(results["done"], 30)
+        self.assertEqual(results["rejected"], 50)
+        self.assert_ledger_matches(first)
+        self.assert_ledger_matches(second)
+        self.assertEqual(first.quantity, 0)
+        self.assertEqual(second.quantity, 70)
+
+
+class MaterialDeleteTests(TestCase):
+    """
+    Smazání použitého materiálu maže kaskádou i jeho řádky - bez vracení do skladu, jehož pohyb
+    by odkazoval na mazaný materiál.
+    """
+    def setUp(self):
+        self.project, self.material, daily_log = create_diary()
+        MaterialUsage(daily_log=daily_log, material=self.material, used_quantity=10).save()
+
+    def assert_deleted(self):
+        connection.check_constraints()
+        self.assertFalse(Material.objects.filter(pk=self.material.pk).exists())
+        self.assertFalse(MaterialUsage.objects.exists())
+        self.assertFalse(StockMovement.objects.filter(material_id=self.material.pk).exists())
+        # náklady smazaných řádků se od projektu odečtou
+        self.assertEqual(Project.objects.get(pk=self.project.pk).total_cost, 0)
+
+    def test_delete_instance(self):
+        self.material.delete()
+        self.assert_deleted()
+
+    def test_delete_view(self):
+        self.client.get(reverse("material-delete", args=[self.material.pk]))
+        self.assert_deleted()
+
+    def test_delete_api(self):
+        response = self.client.delete(reverse("material-api", args=[self.material.pk]))
+        self.assertEqual(response.status_code, 204)
+        self.assert_deleted()
+
+    def test_bulk_delete_api(self):
+        response = self.client.delete(
+            reverse("materials-bulk-api"), [self.material.pk], content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assert_deleted()
+
+    def test_deleting_usage_returns_stock(self):
+        MaterialUsage.objects.get().delete()
+        self.material.refresh_from_db()
+        self.assertEqual(self.material.quantity, 1000)
+
+
+class ArchivedMaterialDeleteTests(TestCase):
+    """
+    Materiál řádků archivovaného projektu se smazat nedá - chyba místo 500, nic se nesmaže.
+    """
+    def setUp(self):
+        project, self.material, daily_log = create_diary()
+        MaterialUsage(daily_log=daily_log, material=self.material, used_quantity=10).save()
+        Project.objects.filter(pk=project.pk).update(status="completed")
+        ProjectArchive.archive(project)
+        self.unused = Material.objects.create(name="Písek", unit="kg", quantity=10, price=100)
+
+    def assert_kept(self):
+        self.assertTrue(Material.objects.filter(pk=self.material.pk).exists())
+        self.assertEqual(ArchivedMaterialUsage.objects.get().material_id, self.material.pk)
+
+    def test_delete_view(self):
+        response = self.client.get(reverse("material-delete", args=[self.material.pk]), follow=True)
+        self.assertRedirects(response, reverse("materials"))
+        self.assertContains(response, MATERIAL_IN_ARCHIVE_ERROR)
+        self.assert_kept()
+
+    def test_delete_api(self):
+        response = self.client.delete(reverse("material-api", args=[self.material.pk]))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"detail": MATERIAL_IN_ARCHIVE_ERROR})
+        self.assert_kept()
+
+    def test_bulk_delete_api(self):
+        response = self.client.delete(
+            reverse("materials-bulk-api"), [self.unused.pk, self.material.pk], content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"errors": [{"index": 1, "errors": {"id": [MATERIAL_IN_ARCHIVE_ERROR]}}]})
+        self.assert_kept()
+        self.assertTrue(Material.objects.filter(pk=self.unused.pk).exists())
+
+
+class StockMovementAdminTests(TestCase):
+    def test_movements_cannot_be_added_by_hand(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "heslo"))
+
+        self.assertEqual(self.client.get(reverse("admin:construction_app_stockmovement_add")).status_code, 403)
+        self.assertNotContains(
+            self.client.get(reverse("admin:construction_app_stockmovement_changelist")),
+            reverse("admin:construction_app_stockmovement_add"),
+        )
+
+
+class MaterialBulkApiTests(TestCase):
+    def patch(self, items):
+        return self.client.patch(reverse("materials-bulk-api"), items, content_type="application/json")
+
+    def test_patch_rejects_duplicate_ids(self):
+        first, second = create_materials(2)
+        response = self.patch([
+            {"id": first.pk, "quantity": 10},
+            {"id": second.pk, "quantity": 20},
+            {"id": first.pk, "quantity": 30},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["duplicate_ids"], [first.pk])
+        first.refresh_from_db()
+        self.assertEqual(first.quantity, 1000)
+        self.assertFalse(StockMovement.objects.filter(kind="correction").exists())
+
+    def test_patch_records_correction(self):
+        material, = create_materials(1)
+        response = self.patch([{"id": material.pk, "quantity": 990}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(StockMovement.objects.get(kind="correction").quantity, -10)
+
+
+class ProjectArchiveTests(TestCase):
+    def test_archive_and_restore_keep_rows_unchanged(self):
+        project, material, daily_log = create_diary()
+        MaterialUsage(daily_log=daily_log, material=material, used_quantity=10).save()
+        photo = Photo.objects.create(sha256="a" * 64, file="photos/a.jpg", size=1)
+        log_photo = DailyLogPhoto.objects.create(daily_log=daily_log, photo=photo, original_name="a.jpg")
+        uploaded_at = log_photo.uploaded_at - timedelta(days=30)
+        DailyLogPhoto.objects.filter(pk=log_photo.pk).update(uploaded_at=uploaded_at)
+        Project.objects.filter(pk=project.pk).update(status="completed")
+        movements = StockMovement.objects.count()
+        total_cost = Project.objects.get(pk=project.pk).total_cost
+
+        archive = ProjectArchive.archive(project)
+
+        self.assertEqual((archive.log_count, archive.usage_count), (1, 1))
+        self.assertFalse(DailyLog.objects.exists())
+        self.assertFalse(MaterialUsage.objects.exists())
+        self.assertEqual(ArchivedDailyLog.objects.get().pk, daily_log.pk)
+        self.assertEqual(ArchivedMaterialUsage.objects.get().used_quantity, 10)
+        self.assertEqual(ArchivedDailyLogPhoto.objects.get().uploaded_at, uploaded_at)
+
+        self.assertEqual(ProjectArchive.restore(project), 1)
+
+        connection.check_constraints()
+        self.assertFalse(ArchivedDailyLog.objects.exists())
+        self.assertEqual(MaterialUsage.objects.get().daily_log_id, daily_log.pk)
+        self.assertEqual(DailyLogPhoto.objects.get().uploaded_at, uploaded_at)
+        # přesun nespouští signály - sklad ani náklady se nezměnily
+        self.assertEqual(StockMovement.objects.count(), movements)
+        self.assertEqual(Material.objects.get(pk=material.pk).quantity, 990)
+        self.assertEqual(Project.objects.get(pk=project.pk).total_cost, total_cost)
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "search_vector se počítá jen na PostgreSQL")
+    def test_update_search_vectors_includes_archived_logs(self):
+        project, material, daily_log = create_diary()
+        Project.objects.filter(pk=project.pk).update(status="completed")
+        ProjectArchive.archive(project)
+        ArchivedDailyLog.objects.update(search_vector=None)
+
+        call_command("update_search_vectors", stdout=io.StringIO())
+
+        self.assertFalse(ArchivedDailyLog.objects.filter(search_vector=None).exists())
+
+
+class MaterialAnalyticsTests(TestCase):
+    def test_active_and_archived_usages_are_summed(self):
+        project, material, daily_log = create_diary()
+        MaterialUsage(daily_log=daily_log, material=material, used_quantity=10).save()
+        Project.objects.filter(pk=project.pk).update(status="completed")
+        ProjectArchive.archive(project)
+        other = Project.objects.create(name="Garáž", location="Brno")
+        for day, quantity in ((7, 4), (14, 6)):
+            other_log = DailyLog.objects.create(
+                project=other, title="Zdivo", date=date(2024, 5, day), work_time=timedelta(hours=8)
+            )
+            MaterialUsage(daily_log=other_log, material=material, used_quantity=quantity).save()
+
+        response = self.client.get(reverse("material-analytics-api"), {"period": "week"})
+
+        series = response.json()["results"][0]["series"]
+        self.assertEqual(
+            [(row["period"], row["usage_count"], row["quantity"], row["cumulative_quantity"]) for row in series],
+            [("2024-05-06", 2, 14, 14), ("2024-05-13", 1, 6, 20)],
+        )
+        self.assertEqual([row["cumulative_cost"] for row in series], ["7.00", "10.00"])
+
+
+class ApiCacheTests(TestCase):
+    def setUp(self):
+        caching.get_cache().clear()
+        self.project, self.material, self.daily_log = create_diary()
+
+    def test_cache_runs_on_locmem(self):
+        self.assertEqual(type(caching.get_cache()).__name__, "LocMemCache")
+
+    def test_matching_etag_returns_304(self):
+        url = reverse("project-api", args=[self.project.pk])
+        response = self.client.get(url)
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["ETag"], etag)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"jiny"').json(), response.json())
+
+    def test_write_invalidates_detail_and_list(self):
+        detail_url = reverse("project-api", args=[self.project.pk])
+        list_url = reverse("projects-api")
+        etag = self.client.get(detail_url)["ETag"]
+        self.client.get(list_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(detail_url, {"name": "Bytový dům"}, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["name"], "Bytový dům")
+        self.assertEqual([row["name"] for row in self.client.get(list_url).json()["results"]], ["Bytový dům"])
+
+    def test_stock_withdrawal_invalidates_material(self):
+        url = reverse("material-api", args=[self.material.pk])
+        self.assertEqual(self.client.get(url).json()["quantity"], 1000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MaterialUsage(daily_log=self.daily_log, material=self.material, used_quantity=10).save()
+
+        self.assertEqual(self.client.get(url).json()["quantity"], 990)
+
+    def test_row_fragments_use_row_cache(self):
+        caching.get_row_cache().clear()
+        self.client.get(reverse("materials"))
+
+        version = caching.get_version(f"api:material:{self.material.pk}:version")
+        # název fragmentu je v šabloně v uvozovkách
+        key = make_template_fragment_key('"material_row"', [self.material.pk, version])
+        self.assertIsNotNone(caching.get_row_cache().get(key))
+        self.assertIsNone(caching.get_cache().get(key))
+
+    def test_stats_count_hits_and_misses(self):
+        before = self.client.get(reverse("cache-stats-api")).json()
+        url = reverse("material-api", args=[self.material.pk])
+        self.client.get(url)
+        self.client.get(url)
+
+        after = self.client.get(reverse("cache-stats-api")).json()
+        self.assertEqual((after["hits"] - before["hits"], after["misses"] - before["misses"]), (1, 1))
+
+
+class FastListDataTests(TestCase):
+    """
+    Seznamy API jen pro čtení serializují values_list() přes fast_list_data - JSON musí být
+    stejný jako z ModelSerializeru, včetně None a Decimal.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        project, material, daily_log = create_diary()
+        Project.objects.create(name="Garáž", location="Praha", end_date=date(2024, 9, 30), status="completed")
+        Material.objects.create(name="Písek", unit=None, quantity=7, price=Decimal("12.5"))
+        DailyLog.objects.filter(pk=daily_log.pk).update(description=None, temperature=None)
+        DailyLog.objects.create(
+            project=project, title="Zdivo", description="Obvodové zdi", date=date(2024, 5, 7),
+            work_time=timedelta(hours=7, minutes=30), temperature=Decimal("-3.5"),
+        )
+
+    def assertSameJson(self, serializer_class, queryset):
+        _, lookups, _ = fast_list_fields(serializer_class)
+        renderer = JSONRenderer()
+        expected = renderer.render(serializer_class(queryset, many=True).data)
+        self.assertEqual(renderer.render(fast_list_data(serializer_class, queryset.values_list(*lookups))), expected)
+
+    def test_project(self):
+        self.assertSameJson(ProjectSerializer, Project.objects.order_by("pk"))
+
+    def test_material(self):
+        self.assertSameJson(MaterialSerializer, Material.objects.order_by("pk"))
+
+    def test_daily_log(self):
+        self.assertSameJson(DailyLogSerializer, DailyLog.objects.order_by("pk"))
+
+
+class VerifyTotalCostTests(TestCase):
+    def test_fix_invalidates_cached_project(self):
+        caching.get_cache().clear()
+        project, material, daily_log = create_diary()
+        MaterialUsage(daily_log=daily_log, material=material, used_quantity=10).save()
+        expected = str(Project.objects.get(pk=project.pk).total_cost)
+        Project.objects.filter(pk=project.pk).update(total_cost=Decimal("123.45"))
+        # řádek seznamu s odchylnou hodnotou se uloží do cache
+        self.assertContains(self.client.get(reverse("projects")), "<td>123,45</td>")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("verify_total_cost", "--fix", stdout=io.StringIO())
+
+        self.assertContains(self.client.get(reverse("projects")), f"<td>{expected.replace('.', ',')}</td>")
+
+
+class RecomputeJobTests(TestCase):
+    def setUp(self):
+        self.project, self.material, self.daily_log = create_diary()
+        MaterialUsage(daily_log=self.daily_log, material=self.material, used_quantity=10).save()
+        self.total_cost = Project.objects.get(pk=self.project.pk).total_cost
+
+    def test_schedule_merges_pending_jobs(self):
+        RecomputeJob.schedule("project_cost", [self.project.pk, None])
+        run_after = RecomputeJob.objects.get().run_after
+
+        RecomputeJob.schedule("project_cost", [self.project.pk])
+        self.assertEqual(RecomputeJob.objects.get().run_after, run_after)
+        # kratší odklad čekající úlohu uspíší
+        RecomputeJob.schedule("project_cost", [self.project.pk], delay=timedelta(0))
+        self.assertLess(RecomputeJob.objects.get().run_after, run_after)
+        RecomputeJob.schedule("daily_summaries", [self.project.pk])
+        self.assertEqual(RecomputeJob.objects.count(), 2)
+
+    def test_claim_takes_only_due_jobs_once(self):
+        RecomputeJob.schedule("project_cost", [self.project.pk], delay=timedelta(0))
+        RecomputeJob.schedule("daily_summaries", [self.project.pk])
+
+        jobs = RecomputeJob.claim(10)
+
+        self.assertEqual([job.kind for job in jobs], ["project_cost"])
+        claimed = RecomputeJob.objects.get(kind="project_cost")
+        self.assertIsNotNone(claimed.started_at)
+        self.assertEqual(claimed.attempts, 1)
+        self.assertEqual(RecomputeJob.claim(10), [])
+
+    def test_claim_takes_over_job_of_crashed_worker(self):
+        RecomputeJob.schedule("project_cost", [self.project.pk], delay=timedelta(0))
+        RecomputeJob.claim(10)
+        RecomputeJob.objects.update(started_at=timezone.now() - RECOMPUTE_JOB_TIMEOUT - timedelta(seconds=1))
+
+        self.assertEqual(len(RecomputeJob.claim(10)), 1)
+        self.assertEqual(RecomputeJob.objects.get().attempts, 2)
+
+    def test_run_recomputes_and_deletes_job(self):
+        Project.objects.filter(pk=self.project.pk).update(total_cost=Decimal("1.00"))
+        RecomputeJob.schedule("project_cost", [self.project.pk], delay=timedelta(0))
+
+        RecomputeJob.claim(10)[0].run()
+
+        self.assertEqual(Project.objects.get(pk=self.project.pk).total_cost, self.total_cost)
+        self.assertFalse(RecomputeJob.objects.exists())
+
+    def test_failed_run_is_retried_with_backoff(self):
+        RecomputeJob.objects.create(kind="neznámá", project=self.project, run_after=timezone.now())
+        job = RecomputeJob.claim(10)[0]
+
+        started = timezone.now()
+        with self.assertRaises(ValueError):
+            job.run()
+
+        job = RecomputeJob.objects.get()
+        self.assertIsNone(job.started_at)
+        self.assertIn("Neznámý druh úlohy", job.last_error)
+        self.assertGreaterEqual(job.run_after, started + RECOMPUTE_DEBOUNCE * 2)
+        # odstup roste s počtem pokusů až do 64násobku
+        job.attempts = 10
+        job.retry(ValueError("znovu"))
+        self.assertGreaterEqual(RecomputeJob.objects.get().run_after, started + RECOMPUTE_DEBOUNCE * 64)
+        self.assertLess(RecomputeJob.objects.get().run_after, timezone.now() + RECOMPUTE_DEBOUNCE * 65)
+
+    def test_failed_run_gives_way_to_newly_scheduled_job(self):
+        RecomputeJob.objects.create(kind="neznámá", project=self.project, run_after=timezone.now())
+        job = RecomputeJob.claim(10)[0]
+        RecomputeJob.objects.create(kind="neznámá", project=self.project, run_after=timezone.now())
+
+        with self.assertRaises(ValueError):
+            job.run()
+
+        self.assertEqual(list(RecomputeJob.objects.values_list("attempts", flat=True)), [0])
+
+    def test_stats(self):
+        RecomputeJob.schedule("project_cost", [self.project.pk], delay=timedelta(0))
+        RecomputeJob.schedule("daily_summaries", [self.project.pk])
+        RecomputeJob.objects.filter(kind="project_cost").update(run_after=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(
+            {key: value for key, value in RecomputeJob.stats().items() if key != "lag_seconds"},
+            {"depth": 2, "ready": 1, "running": 0},
+        )
+        self.assertGreaterEqual(RecomputeJob.stats()["lag_seconds"], 120)
+
+        RecomputeJob.claim(10)
+        self.assertEqual(RecomputeJob.stats(), {"depth": 1, "ready": 0, "running": 1, "lag_seconds": 0})
+
+
+class RecomputeWorkerTests(TransactionTestCase):
+    """
+    Worker volá close_old_connections(), které uvnitř transakce TestCase spojení zavře.
+    """
+    def test_worker_processes_due_jobs(self):
+        project, material, daily_log = create_diary()
+        MaterialUsage(daily_log=daily_log, material=material, used_quantity=10).save()
+        total_cost = Project.objects.get(pk=project.pk).total_cost
+        Project.objects.filter(pk=project.pk).update(total_cost=Decimal("1.00"))
+        RecomputeJob.schedule("project_cost", [project.pk], delay=timedelta(0))
+        RecomputeJob.objects.create(kind="neznámá", project=project, run_after=timezone.now())
+        stdout = io.StringIO()
+
+        with self.assertLogs("construction_app.jobs", "ERROR"):
+            call_command("run_recompute_worker", "--once", stdout=stdout)
+
+        self.assertIn("Zpracováno úloh: 1, neúspěšných: 1", stdout.getvalue())
+        self.assertIn("'depth': 1, 'ready': 0, 'running': 0", stdout.getvalue())
+        self.assertEqual(Project.objects.get(pk=project.pk).total_cost, total_cost)
+        self.assertEqual(RecomputeJob.objects.get().kind, "neznámá")
+
+
+@skipUnlessDBFeature("has_select_for_update_skip_locked")
+class ConcurrentRecomputeClaimTests(TransactionTestCase):
+    def test_concurrent_workers_never_claim_same_job(self):
+        projects = [Project.objects.create(name=f"Projekt {number}", location="Brno") for number in range(20)]
+        RecomputeJob.schedule("project_cost", [project.pk for project in projects], delay=timedelta(0))
+        claimed = []
+        lock = threading.Lock()
+
+        def claim():
+            jobs = RecomputeJob.claim(3)
+            with lock:
+                claimed.extend(job.pk for job in jobs)
+
+        run_concurrently(claim, threads=8, repeat=3)
+        claimed += [job.pk for job in RecomputeJob.claim(100)]
+
+        self.assertEqual(len(claimed), len(set(claimed)))
+        self.assertCountEqual(claimed, RecomputeJob.objects.values_list("pk", flat=True))
+        self.assertEqual(set(RecomputeJob.objects.values_list("attempts", flat=True)), {1})
+
+
+class ProjectReportExportTests(TestCase):
+    def test_streams_active_and_archived_rows(self):
+        project, material, daily_log = create_diary()
+        MaterialUsage(daily_log=daily_log, material=material, used_quantity=10).save()
+        DailyLog.objects.create(project=project, title="Úklid", date=date(2024, 5, 7), work_time=timedelta(hours=2))
+        Project.objects.filter(pk=project.pk).update(status="completed")
+        ProjectArchive.archive(project)
+        DailyLog.objects.create(project=project, title="Revize", date=date(2024, 5, 8), work_time=timedelta(hours=1))
+
+        response = self.client.get(reverse("project-export", args=[project.slug]))
+
+        self.assertTrue(response.streaming)
+        self.assertIn(f'filename="{project.slug}-report.csv"', response["Content-Disposition"])
+        content = b"".join(response.streaming_content).decode("utf-8")
+        self.assertTrue(content.startswith("\ufeff"))
+        rows = list(csv.reader(io.StringIO(content.lstrip("\ufeff")), delimiter=";"))
+        self.assertEqual(rows[0][:3], ["Datum", "Název", "Popis"])
+        # archivované a aktivní záznamy seřazené podle data, záznam bez materiálu s prázdnými sloupci
+        self.assertEqual([(row[0], row[1], row[5], row[7], row[9]) for row in rows[1:]], [
+            ("2024-05-06", "Základy", "Cement", "10", "5.00"),
+            ("2024-05-07", "Úklid", "", "", ""),
+            ("2024-05-08", "Revize", "", "", ""),
+        ])
+
+
+class DailyLogCreateViewTests(TestCase):
+    def post_daily_log(self, project, materials):
+        data = {
+            "project": project.pk,
+            "title": "Betonáž",
+            "date": "2024-05-06",
+            "work_time_in_minutes": 480,
+            "daily_usages-TOTAL_FORMS": len(materials),
+            "daily_usages-INITIAL_FORMS": 0,
+        }
+        for number, material in enumerate(materials):
+            data[f"daily_usages-{number}-material"] = material.pk
+            data[f"daily_usages-{number}-used_quantity"] = 2
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("daily_log-create"), data)
+        self.assertEqual(response.status_code, 302)
+        return len(queries.captured_queries)
+
+    def test_query_count_does_not_depend_on_usage_lines(self):
+        project, _, _ = create_diary()
+        materials = create_materials(20)
+
+        one_line = self.post_daily_log(project, materials[:1])
+        twenty_lines = self.post_daily_log(project, materials)
+
+        self.assertEqual(one_line, twenty_lines)
+        self.assertEqual(MaterialUsage.objects.count(), 21)
+        self.assertEqual(Material.objects.get(pk=materials[0].pk).quantity, 996)
+
+    def test_insufficient_stock_is_rejected(self):
+        project, material, _ = create_diary()
+        data = {
+            "project": project.pk,
+            "title": "Betonáž",
+            "date": "2024-05-06",
+            "work_time_in_minutes": 480,
+            "daily_usages-TOTAL_FORMS": 1,
+            "daily_usages-INITIAL_FORMS": 0,
+            "daily_usages-0-material": material.pk,
+            "daily_usages-0-used_quantity": 1001,
+        }
+        response = self.client.post(reverse("daily_log-create"), data)
+        self.assertContains(response, "Nedostatečné množství materiálu")
+        self.assertFalse(MaterialUsage.objects.exists())
+
+    def test_unknown_material_is_rejected(self):
+        project, material, _ = create_diary()
+        data = {
+            "project": project.pk,
+            "title": "Betonáž",
+            "date": "2024-05-06",
+            "work_time_in_minutes": 480,
+            "daily_usages-TOTAL_FORMS": 2,
+            "daily_usages-INITIAL_FORMS": 0,
+            "daily_usages-0-material": material.pk,
+            "daily_usages-0-used_quantity": 1,
+            "daily_usages-1-material": material.pk + 100,
+            "daily_usages-1-used_quantity": 1,
+        }
+        response = self.client.post(reverse("daily_log-create"), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(MaterialUsage.objects.exists())
+
+
+def add_daily_logs(projects, materials, count, usages_per_log=3):
+    for number in range(count):
+        daily_log = DailyLog.objects.create(
+            project=projects[number % len(projects)],
+            title=f"Betonáž {number}",
+            description="Betonáž základové desky",
+            date=date(2024, 1, 1) + timedelta(days=number),
+            work_time=timedelta(hours=8),
+        )
+        MaterialUsage.bulk_create_for_log(
+            daily_log, [MaterialUsage(material=material, used_quantity=1) for material in materials[:usages_per_log]]
+        )
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Počet SQL dotazů klíčových stránek a API nesmí záviset na počtu řádků (N+1).
+    """
+    # stránky pro přihlášeného admina, počty včetně dotazů na session a uživatele
+    BUDGETS = {
+        "/": 2,
+        "/projects/": 1,
+        "/materials/": 1,
+        "/daily-logs/": 4,
+        "/api/projects/": 3,
+        "/api/materials/": 3,
+        "/api/daily-logs/": 4,
+        "/api/daily-logs/?expand=usages": 5,
+        "/api/daily-logs/search/?q=beton": 4,
+        "/api/analytics/projects/": 3,
+        "/api/analytics/materials/": 3,
+        "/admin/construction_app/project/": 5,
+        # na PostgreSQL včetně odhadu počtu řádků (EstimatedCountPaginator)
+        "/admin/construction_app/dailylog/": 7,
+        "/admin/construction_app/materialusage/": 6,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_superuser("admin", "admin@example.com", "heslo")
+        cls.materials = create_materials(5)
+        cls.projects = [Project.objects.create(name=f"Projekt {number}", location="Brno") for number in range(3)]
+        add_daily_logs(cls.projects, cls.materials, 5)
+
+    def setUp(self):
+        self.client.force_login(User.objects.get(username="admin"))
+
+    def count_queries(self, url):
+        # měří se bez uložených odpovědí a fragmentů
+        caching.get_cache().clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries.captured_queries)
+
+    def test_budgets(self):
+        for url, budget in self.BUDGETS.items():
+            with self.subTest(url=url):
+                self.assertLessEqual(self.count_queries(url), budget)
+
+    def test_daily_log_detail_budget(self):
+        url = reverse("daily_log-api", args=[DailyLog.objects.first().pk])
+        caching.get_cache().clear()
+        with self.assertNumQueries(4):
+            self.client.get(url)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        before = {url: self.count_queries(url) for url in self.BUDGETS}
+        add_daily_logs(self.projects, self.materials, 20)
+        Project.objects.create(name="Projekt navíc", location="Praha")
+        create_materials(5)
+        for url in self.BUDGETS:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), before[url])
+
+
+class KeysetCursorTests(TestCase):
+    """
+    Poškozený kurzor od klienta je 400 v API a první stránka v HTML výpisu, nikdy 500.
+    """
+    MALFORMED = [["abc"], ["x", 1], [{"a": 1}], [None], [1, 2, 3], ["2024-13-45", 1], ["2024-05-06", "abc"]]
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_superuser("admin", "admin@example.com", "heslo")
+        cls.project, cls.material, cls.daily_log = create_diary()
+
+    def setUp(self):
+        self.client.force_login(User.objects.get(username="admin"))
+        caching.get_cache().clear()
+
+    def test_malformed_cursor_is_rejected_by_api(self):
+        for url in ["/api/projects/", "/api/materials/", "/api/daily-logs/", "/api/daily-logs/search/?q=beton"]:
+            for values in self.MALFORMED:
+                with self.subTest(url=url, cursor=values):
+                    response = self.client.get(url, {"cursor": encode_cursor(values)} | (
+                        {"q": "beton"} if "search" in url else {}
+                    ))
+                    self.assertEqual(response.status_code, 400)
+
+    def test_malformed_cursor_falls_back_to_first_page(self):
+        for url in ["/projects/", "/materials/", "/daily-logs/"]:
+            for values in self.MALFORMED:
+                with self.subTest(url=url, cursor=values):
+                    response = self.client.get(url, {"cursor": encode_cursor(values)})
+                    self.assertEqual(response.status_code, 200)
+
+    def test_valid_cursor_is_converted_to_field_types(self):
+        queryset = DailyLog.objects.all()
+        values = decode_cursor(encode_cursor(["2024-05-06", str(self.daily_log.pk)]), queryset, ("-date", "-pk"))
+        self.assertEqual(values, [date(2024, 5, 6), self.daily_log.pk])
+        next_page = self.client.get("/api/daily-logs/", {"cursor": encode_cursor(["2024-05-07", self.daily_log.pk])})
+        self.assertEqual([row["id"] for row in next_page.json()["results"]], [self.daily_log.pk])
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "EXPLAIN plány se ověřují jen na PostgreSQL")
+class IndexUsageTests(TestCase):
+    """
+    Filtrované a řazené dotazy denních záznamů a řádků materiálu používají indexy z Meta.indexes.
+    Sekvenční čtení se vypíná, aby plán na malých testovacích tabulkách neurčovala jejich velikost.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.materials = create_materials(3)
+        cls.projects = [Project.objects.create(name=f"Projekt {number}", location="Brno") for number in range(3)]
+        add_daily_logs(cls.projects, cls.materials, 30)
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+            cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def index_name(self, model, fields):
+        return next(index.name for index in model._meta.indexes if list(index.fields) == fields)
+
+    def assert_uses_index(self, queryset, model, fields):
+        plan = queryset.explain()
+        self.assertIn(self.index_name(model, fields), plan, plan)
+
+    def test_project_date_range(self):
+        queryset = DailyLog.objects.filter(
+            project=self.projects[0], date__gte=date(2024, 1, 5), date__lte=date(2024, 1, 20)
+        ).order_by("-date", "-pk")
+        self.assert_uses_index(queryset, DailyLog, ["project", "date"])
+
+    def test_keyset_page_by_date(self):
+        queryset = DailyLog.objects.filter(date__lt=date(2024, 1, 20)).order_by("-date", "-pk")[:10]
+        self.assert_uses_index(queryset, DailyLog, ["date", "id"])
+
+    def test_material_usages_of_daily_logs(self):
+        daily_logs = DailyLog.objects.filter(project=self.projects[0]).values("pk")
+        queryset = MaterialUsage.objects.filter(material=self.materials[0], daily_log__in=daily_logs)
+        self.assert_uses_index(queryset, MaterialUsage, ["material", "daily_log"])
+
+
+def image_upload(name, image_format, content_type="image/jpeg"):
+    content = io.BytesIO()
+    Image.new("RGB", (40, 30), "red").save(content, image_format)
+    return SimpleUploadedFile(name, content.getvalue(), content_type=content_type)
+
+
+class PhotoUploadTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+        _, _, self.daily_log = create_diary()
+
+    def upload(self, *files):
+        return self.client.post(reverse("daily_log-photos", args=[self.daily_log.pk]), {"photos": list(files)})
+
+    def test_content_other_than_image_is_rejected(self):
+        html = SimpleUploadedFile("foto.jpg", b"<script>alert(1)</script>", content_type="image/jpeg")
+        response = self.upload(html)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Photo.objects.exists())
+
+    def test_extension_and_type_follow_detected_format(self):
+        response = self.upload(image_upload("foto.html", "PNG", content_type="text/html"))
+        self.assertEqual(response.status_code, 302)
+        photo = Photo.objects.get()
+        self.assertTrue(photo.file.name.endswith(".png"))
+        self.assertEqual(photo.content_type, "image/png")
+        self.assertEqual(DailyLogPhoto.objects.get().original_name, "foto.html")
+
+    def test_store_photo_rejects_unsupported_format(self):
+        with self.assertRaises(ValidationError):
+            store_photo(image_upload("foto.bmp", "BMP"))
+
+    def test_thumbnail_failure_is_recorded(self):
+        photo = store_photo(image_upload("foto.jpg", "JPEG"))
+        # poškozený originál na disku - náhledy nejdou vytvořit
+        with open(photo.file.path, "wb") as damaged:
+            damaged.write(b"\0")
+        with self.assertRaises(Exception):
+            generate_thumbnails(photo)
+        photo.refresh_from_db()
+        self.assertFalse(photo.thumbnails_ready)
+        self.assertNotEqual(photo.thumbnail_error, "")
+
+        # příkaz generate_thumbnails fotografii zkusí znovu a chybu po úspěchu smaže
+        with open(photo.file.path, "wb") as repaired:
+            repaired.write(image_upload("foto.jpg", "JPEG").read())
+        generate_thumbnails(photo)
+        photo.refresh_from_db()
+        self.assertTrue(photo.thumbnails_ready)
+        self.assertEqual(photo.thumbnail_error, "")
+        self.assertTrue(os.path.exists(os.path.join(photo.file.storage.location, photo.thumbnail_path("thumb"))))
+
+
+def search_config_uses_unaccent():
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT 1 FROM pg_ts_config config
+            JOIN pg_ts_config_map map ON map.mapcfg = config.oid
+            JOIN pg_ts_dict dictionary ON dictionary.oid = map.mapdict
+            WHERE config.cfgname = %s AND dictionary.dictname = 'unaccent'
+            """,
+            [SEARCH_CONFIG],
+        )
+        return cursor.fetchone() is not None
+
+
+class DailyLogSearchTests(TestCase):
+    """
+    Hledání bez ohledu na diakritiku - vyžaduje PostgreSQL s konfigurací DAILY_LOG_SEARCH_CONFIG
+    vytvořenou migrací (UnaccentExtension a CreateUnaccentSearchConfig).
+    """
+    @classmethod
+    def setUpClass(cls):
+        # ověřuje se až v testovací databázi, před uložením prvního záznamu
+        if not search_config_uses_unaccent():
+            raise unittest.SkipTest(f"konfigurace fulltextu {SEARCH_CONFIG} bez unaccent není v databázi vytvořená")
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        project = Project.objects.create(name="Rodinný dům", location="Brno")
+        cls.daily_log = DailyLog.objects.create(
+            project=project, title="Základy", description="Betonáž základové desky, betón C25",
+            date=date(2024, 5, 6), work_time=timedelta(hours=8),
+        )
+
+    def search(self, text):
+        return list(search_daily_logs(DailyLog.objects.all(), text))
+
+    def test_query_without_diacritics(self):
+        self.assertEqual(self.search("zaklady"), [self.daily_log])
+        self.assertEqual(self.search("beton"), [self.daily_log])
+
+    def test_query_with_diacritics(self):
+        self.assertEqual(self.search("betón"), [self.daily_log])
+        self.assertEqual(self.search("betonáž"), [self.daily_log])
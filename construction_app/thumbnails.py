@@ -0,0 +1,24 @@
+"""
+Generování náhledů fotografií. Modul nesmí importovat Django, spouští se v samostatných
+procesech ProcessPoolExecutoru.
+"""
+import os
+
+from PIL import Image, ImageOps
+
+
+def make_thumbnails(source_path, targets):
+    """
+    Vytvoří náhledy zdrojové fotografie. targets = [(cílová cesta, (šířka, výška)), ...]
+    """
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        for target_path, size in targets:
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            thumbnail = image.copy()
+            thumbnail.thumbnail(size)
+            # zápis přes dočasný soubor, aby se nikdy neservíroval nedokončený náhled
+            temporary_path = f"{target_path}.tmp"
+            thumbnail.save(temporary_path, "JPEG", quality=85, optimize=True)
+            os.replace(temporary_path, target_path)
+    return [target_path for target_path, _ in targets]
@@ -4,6 +4,7 @@ from django.urls import path
 
 from . import views
 from . import api_views
+from . import async_views
 
 urlpatterns = [
     path('', views.Dashboard.as_view(), name='dashboard'),
@@ -11,6 +12,7 @@ urlpatterns = [
     path('projects/new/', views.ProjectCreateView.as_view(), name='project-create'),
     path('projects/<slug:slug>/edit/', views.ProjectUpdateView.as_view(), name="project-edit"),
     path('projects/<slug:slug>/delete/', views.ProjectDeleteView.as_view(), name="project-delete"),
+    path('projects/<slug:slug>/export/', views.ProjectReportExportView.as_view(), name="project-export"),
     path('materials/', views.MaterialListView.as_view(), name="materials"),
     path('materials/new/', views.MaterialCreateView.as_view(), name='material-create'),
     path('materials/<int:pk>/edit/', views.MaterialUpdateView.as_view(), name='material-edit'),
@@ -18,9 +20,24 @@ urlpatterns = [
     path('daily-logs/', views.DailyLogListView.as_view(), name='daily_logs'),
     path('daily-logs/new/', views.DailyLogCreateView.as_view(), name="daily_log-create"),
     path('daily-logs/<int:pk>/edit/', views.DailyLogUpdateView.as_view(), name="daily_log-edit"),
+    path('daily-logs/<int:pk>/photos/', views.DailyLogPhotoUploadView.as_view(), name="daily_log-photos"),
     path('daily-logs/<int:pk>/delete/', views.DailyLogDeleteView.as_view(), name="daily_log-delete"),
     path('api/projects/', api_views.ProjectListApiView.as_view(), name="projects-api"),
     path('api/projects/<int:pk>/', api_views.ProjectDetailApiView.as_view(), name="project-api"),
     path('api/materials/', api_views.MaterialListApiView.as_view(), name="materials-api"),
+    path('api/materials/bulk/', api_views.MaterialBulkApiView.as_view(), name="materials-bulk-api"),
     path('api/materials/<int:pk>/', api_views.MaterialDetailApiView.as_view(), name="material-api"),
+    path('api/materials/<int:pk>/stock/', api_views.MaterialStockApiView.as_view(), name="material-stock-api"),
+    path('api/async/projects/', async_views.AsyncProjectListApiView.as_view(), name="projects-async-api"),
+    path('api/async/projects/<int:pk>/', async_views.AsyncProjectDetailApiView.as_view(), name="project-async-api"),
+    path('api/async/materials/', async_views.AsyncMaterialListApiView.as_view(), name="materials-async-api"),
+    path('api/async/materials/<int:pk>/', async_views.AsyncMaterialDetailApiView.as_view(), name="material-async-api"),
+    path('api/analytics/projects/', api_views.ProjectAnalyticsApiView.as_view(), name="project-analytics-api"),
+    path('api/analytics/materials/', api_views.MaterialAnalyticsApiView.as_view(), name="material-analytics-api"),
+    path('api/cache-stats/', api_views.ApiCacheStatsView.as_view(), name="cache-stats-api"),
+    path('api/recompute-jobs/stats/', api_views.RecomputeQueueStatsView.as_view(), name="recompute-stats-api"),
+    path('api/daily-logs/', api_views.DailyLogListApiView.as_view(), name="daily_logs-api"),
+    path('api/daily-logs/<int:pk>/', api_views.DailyLogDetailApiView.as_view(), name="daily_log-api"),
+    path('api/daily-logs/search/', api_views.DailyLogSearchApiView.as_view(), name="daily_logs-search-api"),
+    path('api/daily-logs/ingest/', api_views.DailyLogIngestApiView.as_view(), name="daily_logs-ingest-api"),
 ]
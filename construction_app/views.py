@@ -1,22 +1,74 @@
-from django.http import HttpResponse, HttpResponseRedirect
-from django.shortcuts import render, redirect
+from django.core.exceptions import ValidationError
+from datetime import timedelta
+
+from django.contrib import messages
+from django.db import models, transaction
+from django.db.models import ExpressionWrapper, ProtectedError, Sum
+from django.db.models.functions import NullIf
+from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
+from django.utils import timezone
 from django.views import View
 from django.views.generic import CreateView, TemplateView, ListView
 from django.views.generic.edit import UpdateView, DeleteView
 
-from .models import Project, Material, DailyLog
-from .forms import DailyLogForm, MaterialUsageFormSet, ProjectForm, MaterialForm
+from .caching import RowCacheMixin
+from .models import (
+    Project, Material, ArchivedDailyLog, DailyLog, DailyLogPhoto, ProjectDailySummary, MATERIAL_IN_ARCHIVE_ERROR,
+)
+from .forms import DailyLogForm, DailyLogFilterForm, DailyLogPhotoForm, MaterialUsageFormSet, ProjectForm, MaterialForm
+from .pagination import KeysetPaginationMixin
+from .photos import store_photo
+from .reports import iter_project_report_csv
+
+
+def summary_totals():
+    """
+    Agregace nad denními souhrny - součty a průměrná teplota za seskupené řádky
+    """
+    return {
+        "log_count": Sum("log_count"),
+        "work_time": Sum("work_time"),
+        "material_cost": Sum("material_cost"),
+        "usage_count": Sum("usage_count"),
+        "average_temperature": ExpressionWrapper(
+            Sum("temperature_sum") / NullIf(Sum("temperature_count"), 0),
+            output_field=models.DecimalField(max_digits=20, decimal_places=2),
+        ),
+    }
 
 
 class Dashboard(TemplateView):
     template_name = "construction_app/dashboard.html"
+    trend_days = 30
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # vše se čte z denních souhrnů, ne z denních záznamů
+        context["project_totals"] = (
+            ProjectDailySummary.objects
+            .values("project__name", "project__status")
+            .annotate(**summary_totals())
+            .order_by("project__name")
+        )
+        since = timezone.localdate() - timedelta(days=self.trend_days)
+        context["daily_trend"] = (
+            ProjectDailySummary.objects
+            .filter(date__gte=since)
+            .values("date")
+            .annotate(**summary_totals())
+            .order_by("date")
+        )
+        context["trend_days"] = self.trend_days
+        return context
 
-class ProjectListView(ListView):
+
+class ProjectListView(RowCacheMixin, KeysetPaginationMixin, ListView):
     model = Project
     template_name = "construction_app/project_list.html"
     context_object_name = "projects"  # název proměnné v šabloně
+    queryset = Project.objects.select_related("archive")
 
 
 class ProjectCreateView(CreateView):
@@ -47,7 +99,16 @@ class ProjectDeleteView(DeleteView):
         return HttpResponseRedirect(self.success_url)
 
 
-class MaterialListView(ListView):
+class ProjectReportExportView(View):
+    def get(self, request, slug):
+        """Streamuje CSV report všech denních záznamů projektu včetně materiálů a nákladů"""
+        project = get_object_or_404(Project, slug=slug)
+        response = StreamingHttpResponse(iter_project_report_csv(project), content_type="text/csv; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="{project.slug}-report.csv"'
+        return response
+
+
+class MaterialListView(RowCacheMixin, KeysetPaginationMixin, ListView):
     model = Material
     template_name = "construction_app/material_list.html"
     context_object_name = "materials"
@@ -74,13 +135,35 @@ class MaterialDeleteView(DeleteView):
     def get(self, request, *args, **kwargs):
         """Přesměruje GET požadavky na přímé odstranění záznamu"""
         self.object = self.get_object()  # získání objekut, který bude smazán
-        self.object.delete()
+        try:
+            self.object.delete()
+        except ProtectedError:
+            messages.error(request, f"{self.object.name}: {MATERIAL_IN_ARCHIVE_ERROR}")
         return HttpResponseRedirect(self.success_url)
 
-class DailyLogListView(ListView):
+class DailyLogListView(RowCacheMixin, KeysetPaginationMixin, ListView):
     model = DailyLog
     template_name = "construction_app/daily_log_list.html"
     context_object_name = "daily_logs"
+    keyset_ordering = ("-date", "-pk")
+    # řádek vypisuje název projektu
+    row_cache_related = ("project",)
+
+    def get_queryset(self):
+        self.filter_form = DailyLogFilterForm(self.request.GET or None)
+        # projekt a náhledy fotografií se vypisují v každém řádku
+        queryset = super().get_queryset().select_related("project").prefetch_related("photos__photo")
+        self.keyset_ordering = self.filter_form.get_ordering(DailyLogListView.keyset_ordering)
+        return self.filter_form.filter(queryset)
+
+    def get_keyset_page(self, queryset):
+        # archivované záznamy dokončených projektů se stránkují společně s aktivními
+        archived = ArchivedDailyLog.objects.select_related("project").prefetch_related("photos__photo")
+        return super().get_keyset_page([queryset, self.filter_form.filter(archived)])
+
+    def get_context_data(self, **kwargs):
+        kwargs["filter_form"] = self.filter_form
+        return super().get_context_data(**kwargs)
 
 
 class DailyLogCreateView(CreateView):
@@ -104,10 +187,16 @@ class DailyLogCreateView(CreateView):
         material_usage_formset = context["material_usage_formset"]
 
         if material_usage_formset.is_valid():
-            daily_log.save()
-            material_usage_formset.instance = daily_log
-            material_usage_formset.save()
-            return reverse_lazy("daily_logs")
+            try:
+                # záznam i všechny řádky materiálu v jedné transakci s hromadným uložením
+                with transaction.atomic():
+                    daily_log.save()
+                    material_usage_formset.instance = daily_log
+                    material_usage_formset.save_bulk()
+                return HttpResponseRedirect(self.success_url)
+            except ValidationError as error:
+                # sklad mezitím vyčerpal souběžný zápis
+                form.add_error(None, error)
 
         return render(self.request, self.template_name, {
             "daily_log_form": form,
@@ -115,6 +204,38 @@ class DailyLogCreateView(CreateView):
         })
 
 
+class DailyLogPhotoUploadView(View):
+    template_name = "construction_app/daily_log_photos.html"
+
+    def get(self, request, pk):
+        daily_log = get_object_or_404(DailyLog, pk=pk)
+        return self.render(daily_log, DailyLogPhotoForm())
+
+    def post(self, request, pk):
+        """Uloží nahrané fotografie (soubory jsou už na disku díky TemporaryFileUploadHandler)"""
+        daily_log = get_object_or_404(DailyLog, pk=pk)
+        form = DailyLogPhotoForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return self.render(daily_log, form)
+
+        for uploaded_file in form.cleaned_data["photos"]:
+            photo = store_photo(uploaded_file)
+            DailyLogPhoto.objects.get_or_create(
+                daily_log=daily_log,
+                photo=photo,
+                defaults={"original_name": uploaded_file.name[:255]},
+            )
+        return HttpResponseRedirect(reverse_lazy("daily_log-photos", args=[daily_log.pk]))
+
+    def render(self, daily_log, form):
+        photos = daily_log.photos.select_related("photo").order_by("uploaded_at")
+        return render(self.request, self.template_name, {
+            "daily_log": daily_log,
+            "photos": photos,
+            "form": form,
+        })
+
+
 class DailyLogUpdateView(UpdateView):
 #     model = DailyLog
 #     form_class = DailyLogForm
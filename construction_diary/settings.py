@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'construction_app',
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'construction_app.middleware.SqlInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -91,6 +93,69 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    # sdílená všemi procesy na serveru (webové workery, run_recompute_worker, archive_projects, ...),
+    # aby zneplatnění uložených API odpovědí jedním procesem platilo i pro ostatní; při více serverech
+    # 'django.core.cache.backends.redis.RedisCache' s 'LOCATION': 'redis://...'
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    # fragmenty řádků HTML seznamů - v paměti každého procesu, klíč obsahuje verzi řádku ze sdílené
+    # cache, takže po změně objektu ani jiný proces starý fragment nevrátí; souborová cache by
+    # na každý uložený fragment procházela celý adresář
+    'row_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'row_fragments',
+        'OPTIONS': {'MAX_ENTRIES': 30000},
+    },
+}
+
+API_CACHE_ALIAS = 'default'
+API_CACHE_TIMEOUT = 300
+ROW_CACHE_ALIAS = 'row_fragments'
+ROW_CACHE_TIMEOUT = 300
+
+# testy běží nad LocMemCache, aby nemazaly sdílenou cache v BASE_DIR / 'cache'
+TEST_RUNNER = 'construction_app.test_runner.LocMemCacheTestRunner'
+
+
+# Měření SQL dotazů po požadavcích (hlavička Server-Timing a log pomalých požadavků)
+
+SQL_INSTRUMENTATION = {
+    'ENABLED': False,
+    'SLOW_REQUEST_MS': 500,
+    'SLOWEST_QUERIES': 5,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'sql_report': {
+            '()': 'construction_app.middleware.SqlReportFormatter',
+        },
+    },
+    'handlers': {
+        'sql_report': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'sql_report',
+        },
+    },
+    'loggers': {
+        'construction_app.sql': {
+            'handlers': ['sql_report'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -127,6 +192,25 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Nahrané soubory (fotodokumentace)
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# nahrávané soubory se vždy průběžně zapisují na disk, ne do paměti
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# počet procesů pro generování náhledů fotografií
+PHOTO_THUMBNAIL_WORKERS = 2
+
+# konfigurace fulltextového hledání v denních záznamech (PostgreSQL); "simple_unaccent" (hledání
+# bez ohledu na diakritiku) se zapne až po migraci s UnaccentExtension() a
+# construction_app.search.CreateUnaccentSearchConfig() - bez ní selže každé uložení záznamu;
+# česká vyžaduje v databázi vytvořenou konfiguraci "czech" nad ispell slovníkem
+DAILY_LOG_SEARCH_CONFIG = 'simple'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 